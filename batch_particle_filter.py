@@ -0,0 +1,166 @@
+"""
+Runs B independent copies of the tilt/bias particle filter from particle_filter.py in lockstep.
+
+The particle sets of all the filters are stored as one (B, N, 3) tensor, so the motion model,
+the likelihoods and the resampling of the whole fleet are each done with a handful of NumPy
+calls per time step instead of one Python-level filter loop per sensor or Monte Carlo seed.
+"""
+import numpy as np
+import particle_filter as pf                            # the tilt/bias model
+import resampling
+import samples_and_measurements as sm
+
+
+class BatchParticleFilter:
+    """
+    B independent particle filters with N particles each, advanced together by step().
+    Every filter keeps its own weights and is only resampled when its own effective sample
+    size drops below ess_fraction * N.
+    """
+
+    def __init__(self, n_filters, n_samples=10000, init_low=-3, init_high=3,
+                 ess_fraction=pf.resample_fraction, resampler=resampling.batch_stratified_resample,
+                 seed=None):
+        """
+        Parameters:
+        n_filters: number of independent filters B
+        n_samples: number of particles N in each filter
+        init_low, init_high: interval [init_low, init_high) the initial particles are uniformly drawn from
+        ess_fraction: a filter is resampled when its effective sample size drops below ess_fraction * N
+        resampler: one of the batch_* resamplers from resampling.py
+        seed: seed, SeedSequence or Generator for the numpy Generator shared by the batch
+        """
+        self.n_filters = n_filters
+        self.n_samples = n_samples
+        self.dim = pf.Ad.shape[0]
+        self.init_low, self.init_high = init_low, init_high
+        self.ess_fraction = ess_fraction
+        self.resampler = resampler
+        self.rng = np.random.default_rng(seed)
+
+        shape = (n_filters, n_samples, self.dim)
+        self._particles = np.empty((2,) + shape)               # ping-pong particle buffers
+        self._current = 0
+        self._noise = np.empty(shape)
+        self._motion_noise = np.empty(shape)
+        self._innovation = np.empty((n_filters, n_samples, pf.C.shape[0]))
+        self._scaled_innovation = np.empty_like(self._innovation)  # innovation @ Rd^-1
+        self.log_weights = np.empty((n_filters, n_samples))
+        self.weights = np.empty((n_filters, n_samples))
+
+        self.reset()
+
+    @property
+    def particles(self):
+        """(B, N, 3) view of the current particle sets."""
+        return self._particles[self._current]
+
+    def reset(self, particles=None):
+        """
+        Reinitialises all the filters with uniform weights.
+
+        Parameters:
+        particles: optional (B, N, 3) or (N, 3) array of initial particles. If not given, the
+                   particles are drawn uniformly from [init_low, init_high)
+        """
+        current = self.particles
+        if particles is None:
+            self.rng.random(out=current)
+            current *= self.init_high - self.init_low
+            current += self.init_low
+        else:
+            current[:] = particles
+        self.log_weights.fill(-np.log(self.n_samples))
+        self.weights.fill(1 / self.n_samples)
+        self.steps = 0
+        self.resample_count = np.zeros(self.n_filters, dtype=int)
+
+    def step(self, measurements_t):
+        """
+        Runs one predict, weight and resample cycle of every filter.
+
+        Parameters:
+        measurements_t: (B, 2) array with the measurement [z_theta, z_dtheta] of every filter,
+                        or a single (2,) measurement shared by all of them
+
+        Returns: (B,) boolean array, True for the filters that were resampled in this step
+        """
+        pred_state = self._particles[1 - self._current]
+
+        # batched motion model: x_t1 = Ad x_t + N(0, Qd) for every particle of every filter.
+        # The matrix products run on (B * N, 3) views so they go through a single BLAS call.
+        flat_shape = (self.n_filters * self.n_samples, self.dim)
+        np.matmul(self.particles.reshape(flat_shape), pf.Ad.T, out=pred_state.reshape(flat_shape))
+        self.rng.standard_normal(out=self._noise)
+        np.matmul(self._noise.reshape(flat_shape), pf.Qd_chol.T, out=self._motion_noise.reshape(flat_shape))
+        pred_state += self._motion_noise
+        self._current = 1 - self._current
+
+        # batched log likelihoods: log w_t1 = log w_t + log p(z_t | x_t1)
+        measurements_t = np.asarray(measurements_t)
+        if measurements_t.ndim == 2:
+            measurements_t = measurements_t[:, np.newaxis, :]       # broadcast over the particles
+        np.matmul(pred_state.reshape(flat_shape), pf.C.T,
+                  out=self._innovation.reshape(self.n_filters * self.n_samples, -1))
+        np.subtract(measurements_t, self._innovation, out=self._innovation)
+        np.matmul(self._innovation.reshape(self.n_filters * self.n_samples, -1), pf.Rd_inv,
+                  out=self._scaled_innovation.reshape(self.n_filters * self.n_samples, -1))
+        mahalanobis = np.einsum("bij,bij->bi", self._scaled_innovation, self._innovation,
+                                out=self.weights)                   # weights buffer as scratch space
+        np.multiply(mahalanobis, -0.5, out=mahalanobis)
+        self.log_weights += mahalanobis
+        self.log_weights += pf.Rd_log_norm
+        self._normalize()
+        self.steps += 1
+
+        # per-filter resampling, only for the filters whose weights have degenerated
+        ess = 1.0 / np.einsum("bi,bi->b", self.weights, self.weights)
+        resample = ess < self.ess_fraction * self.n_samples
+        rows = np.flatnonzero(resample)
+        if rows.size:
+            indices = self.resampler(self.weights[rows], rng=self.rng)
+            indices += rows[:, np.newaxis] * self.n_samples       # into the flattened (B * N, 3) array
+            pred_state[rows] = pred_state.reshape(flat_shape)[indices]
+            self.log_weights[rows] = -np.log(self.n_samples)
+            self.weights[rows] = 1 / self.n_samples
+            self.resample_count[rows] += 1
+        return resample
+
+    def estimate(self):
+        """Returns the (B, 3) weighted means of the particle sets, one state estimate per filter."""
+        return np.einsum("bi,bid->bd", self.weights, self.particles)
+
+    def _normalize(self):
+        """Row-wise in-place log-sum-exp normalization of the weights."""
+        max_log_weight = np.max(self.log_weights, axis=1, keepdims=True)
+        diverged = ~np.isfinite(max_log_weight[:, 0])
+        if np.any(diverged):
+            self.log_weights[diverged] = 0.0                 # no particle is plausible: start over uniformly
+            max_log_weight[diverged] = 0.0
+
+        np.subtract(self.log_weights, max_log_weight, out=self.weights)
+        np.exp(self.weights, out=self.weights)
+        weight_sum = np.sum(self.weights, axis=1, keepdims=True)
+        self.log_weights -= max_log_weight + np.log(weight_sum)
+        self.weights /= weight_sum
+
+
+def main():
+    n_filters = 16                                              # independent Monte Carlo seeds
+    n_samples = 1000                                            # particles per filter
+    batch = BatchParticleFilter(n_filters, n_samples, seed=0)
+
+    z_theta, z_dtheta = sm.retreive_data(0)                     # measurements; unit rad, rad/sec
+    measurements = np.c_[z_theta, z_dtheta]
+
+    estimates = np.empty((len(measurements), n_filters, batch.dim))
+    for t, z_t in enumerate(measurements):
+        batch.step(z_t)                                         # every filter sees the same measurement
+        estimates[t] = batch.estimate()
+
+    print("Final theta estimate of each filter:", estimates[-1, :, 1])
+    print("Spread over the filters:", np.std(estimates[-1, :, 1]))
+
+
+if __name__ == "__main__":
+    main()
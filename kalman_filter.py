@@ -0,0 +1,149 @@
+"""
+Kalman filter and Rauch-Tung-Striebel (RTS) smoother for the linear-Gaussian tilt/bias model of
+particle_filter.py: x_t1 = Ad x_t + N(0, Qd), z_t = C x_t + N(0, Rd), with the state [dtheta, theta, bias].
+
+In this model the covariances and gains do not depend on the measurements, only on the time step.
+They are computed once for a whole run by kalman_gains(), and the filter and the smoother then only
+update the means, for a single (T, 2) measurement sequence or for B sequences at once as (B, T, 2).
+With steady_state=True the constant steady-state gain is used at every step instead.
+
+This is a fast reference for checking the accuracy of the particle filters.
+"""
+import time
+import numpy as np
+import particle_filter as pf                            # the tilt/bias model
+import samples_and_measurements as sm
+
+init_cov = 3.0 * np.identity(3)                         # variance of the uniform [-3, 3) particles of the PF
+
+
+def steady_state_gain(tol=1e-12, max_iter=100000):
+    """
+    Iterates the Riccati recursion of the filter until the predicted covariance converges.
+
+    Returns:
+    gain: 3x2 steady-state Kalman gain
+    pred_cov: 3x3 steady-state predicted covariance P_{t|t-1}
+    filt_cov: 3x3 steady-state filtered covariance P_{t|t}
+    """
+    pred_cov = init_cov
+    for _ in range(max_iter):
+        gain = pred_cov @ pf.C.T @ np.linalg.inv(pf.C @ pred_cov @ pf.C.T + pf.Rd)
+        filt_cov = (np.identity(3) - gain @ pf.C) @ pred_cov
+        next_pred_cov = pf.Ad @ filt_cov @ pf.Ad.T + pf.Qd
+        if np.max(np.abs(next_pred_cov - pred_cov)) < tol:
+            return gain, next_pred_cov, filt_cov
+        pred_cov = next_pred_cov
+    raise RuntimeError("The Riccati recursion did not converge in " + str(max_iter) + " iterations.")
+
+
+def kalman_gains(n_steps, initial_cov=init_cov, steady_state=False):
+    """
+    Covariances and gains of the filter for n_steps time steps. Every step predicts with the motion
+    model and then updates with the measurement, like the particle filter.
+
+    Parameters:
+    n_steps: number of time steps T
+    initial_cov: 3x3 covariance of the initial state
+    steady_state: use the steady-state gain and covariances at every step
+
+    Returns a dict with the (T, 3, 2) gains and the (T, 3, 3) predicted (pred_covs) and
+    filtered (filt_covs) covariances.
+    """
+    if steady_state:
+        gain, pred_cov, filt_cov = steady_state_gain()
+        return {"gains": np.broadcast_to(gain, (n_steps, 3, 2)),
+                "pred_covs": np.broadcast_to(pred_cov, (n_steps, 3, 3)),
+                "filt_covs": np.broadcast_to(filt_cov, (n_steps, 3, 3))}
+
+    gains = np.empty((n_steps, 3, 2))
+    pred_covs = np.empty((n_steps, 3, 3))
+    filt_covs = np.empty((n_steps, 3, 3))
+    filt_cov = initial_cov
+    for t in range(n_steps):
+        pred_covs[t] = pf.Ad @ filt_cov @ pf.Ad.T + pf.Qd
+        gains[t] = pred_covs[t] @ pf.C.T @ np.linalg.inv(pf.C @ pred_covs[t] @ pf.C.T + pf.Rd)
+        filt_cov = (np.identity(3) - gains[t] @ pf.C) @ pred_covs[t]
+        filt_covs[t] = filt_cov
+    return {"gains": gains, "pred_covs": pred_covs, "filt_covs": filt_covs}
+
+
+def kalman_filter(measurements, initial_state=None, gains=None, steady_state=False):
+    """
+    Runs the Kalman filter over whole measurement sequences.
+
+    Parameters:
+    measurements: (T, 2) array of [z_theta, z_dtheta] rows, or (B, T, 2) for B sequences at once
+    initial_state: (3,) or (B, 3) initial state. Defaults to 0
+    gains: output of kalman_gains(), to reuse it across runs of the same length
+    steady_state: use the steady-state gain, if gains is not given
+
+    Returns:
+    means: (T, 3) or (B, T, 3) filtered state estimates [dtheta, theta, bias]
+    covs: (T, 3, 3) filtered covariances, the same for every sequence
+    """
+    measurements = np.asarray(measurements)
+    n_steps = measurements.shape[-2]
+    if gains is None:
+        gains = kalman_gains(n_steps, steady_state=steady_state)
+
+    means = np.empty(measurements.shape[:-1] + (3,))
+    state = np.zeros(measurements.shape[:-2] + (3,)) if initial_state is None else np.asarray(initial_state, dtype=np.float64)
+    for t in range(n_steps):
+        pred = state @ pf.Ad.T
+        innovation = measurements[..., t, :] - pred @ pf.C.T
+        state = pred + innovation @ gains["gains"][t].T
+        means[..., t, :] = state
+    return means, gains["filt_covs"]
+
+
+def rts_smoother(measurements, initial_state=None, steady_state=False):
+    """
+    Kalman filter followed by the Rauch-Tung-Striebel backward pass, i.e. the estimate of every
+    state given all the measurements of the sequence.
+
+    Parameters: as for kalman_filter()
+
+    Returns:
+    means: (T, 3) or (B, T, 3) smoothed state estimates
+    covs: (T, 3, 3) smoothed covariances
+    """
+    measurements = np.asarray(measurements)
+    n_steps = measurements.shape[-2]
+    gains = kalman_gains(n_steps, steady_state=steady_state)
+    filt_means, filt_covs = kalman_filter(measurements, initial_state, gains)
+    pred_covs = gains["pred_covs"]
+
+    means = filt_means.copy()
+    covs = np.array(filt_covs)
+    for t in range(n_steps - 2, -1, -1):
+        smoother_gain = filt_covs[t] @ pf.Ad.T @ np.linalg.inv(pred_covs[t + 1])
+        means[..., t, :] += (means[..., t + 1, :] - filt_means[..., t, :] @ pf.Ad.T) @ smoother_gain.T
+        covs[t] += smoother_gain @ (covs[t + 1] - pred_covs[t + 1]) @ smoother_gain.T
+    return means, covs
+
+
+def main():
+    z_theta, z_dtheta = sm.retreive_data(0)                     # measurements; unit rad, rad/sec
+    theta_true, dtheta_true = sm.retreive_data(1)               # validation;   unit rad, rad/sec
+    measurements = np.c_[z_theta, z_dtheta]
+
+    for name, run in (("KF", kalman_filter), ("KF steady state", lambda z: kalman_filter(z, steady_state=True)),
+                      ("RTS smoother", rts_smoother)):
+        start = time.perf_counter()
+        means, covs = run(measurements)
+        elapsed = time.perf_counter() - start
+        theta_est = means[:, 1] + (np.pi / 2)                   # same offset as used in visualizePF_live
+        print(name.ljust(16), "RMSE theta:", np.sqrt(np.mean((theta_est - theta_true) ** 2)),
+              " RMSE dtheta:", np.sqrt(np.mean((means[:, 0] - dtheta_true) ** 2)),
+              " {:.2f} us per step".format(1e6 * elapsed / len(measurements)))
+
+    batch = np.broadcast_to(measurements, (1000,) + measurements.shape)     # 1000 sequences at once
+    start = time.perf_counter()
+    kalman_filter(batch, steady_state=True)
+    elapsed = time.perf_counter() - start
+    print("Batch of 1000:   {:.3f} us per sequence and step".format(1e6 * elapsed / batch.shape[0] / batch.shape[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,77 @@
 Simulating a simple coin flip. Could not find the source of this code.
 """
 
-import random
-import numpy as np 
+import numpy as np
 import matplotlib.pyplot as plt
 
-def coin_flip():
-    """Simulate flipping of a coin where 0 is Heads and 1 is Tails"""
-    return random.randint(0, 1)
+def coin_flip(rng=None):
+    """Simulate flipping of a coin where 0 is Heads and 1 is Tails. rng is a seed or numpy Generator"""
+    return np.random.default_rng(rng).integers(0, 2)
 
-prob_list = []
-def monte_carlo(n):
-    results = 0
-    for i in range(n):
-        flip_result = coin_flip()               # perform the flip
-        results += flip_result                  # add the result to the sum 
 
-        probability = results/(i+1)             # calculate current probability after each flip 
-        prob_list.append(probability)           # list of change of probability after each flip
+def bernoulli(p=0.5):
+    """Sampler for running_estimate(): n Bernoulli(p) trials, 1 with probability p. p = 0.5 is a fair coin."""
+    def sample(rng, n):
+        if p == 0.5:
+            return rng.integers(0, 2, n, dtype=np.uint8)        # cheapest draw for a fair coin
+        return (rng.random(n) < p).astype(np.uint8)
+    return sample
 
-        plt.axhline(y=0.5, color='r', linestyle='-')
-        plt.xlabel("Iterations")
-        plt.ylabel("Probability")
-        plt.plot(prob_list)
 
-    return results/n
+def running_estimate(sample, n, rng=None, chunk_size=2 ** 22, n_trace=1000):
+    """
+    Running mean of n random trials, i.e. the estimate after 1, 2, ..., n trials, without a Python loop per trial.
 
-flip5k = monte_carlo(5000)
-print(flip5k)
\ No newline at end of file
+    The trials are drawn in chunks of chunk_size, and the running mean cumsum / arange of each chunk
+    is only kept at n_trace log-spaced trial counts, so memory stays bounded for 10^8 trials and more.
+
+    Parameters:
+    sample: function sample(rng, size) returning an array of integer, boolean or float trials, e.g. bernoulli()
+    n: number of trials
+    rng: seed or numpy Generator
+    chunk_size: number of trials drawn at once
+    n_trace: number of points of the convergence trace
+
+    Returns:
+    estimate: mean of all the n trials
+    trace: (k, 2) array of (number of trials, running mean) at log-spaced trial counts
+    """
+    rng = np.random.default_rng(rng)
+    trace_at = np.unique(np.geomspace(1, n, n_trace).astype(np.int64))     # trial counts to keep
+    trace = np.empty(len(trace_at))
+
+    total = 0
+    for start in range(0, n, chunk_size):
+        trials = sample(rng, min(chunk_size, n - start))
+        dtype = np.int64 if trials.dtype.kind in "biu" else np.float64     # exact sums for integer trials
+        lo, hi = np.searchsorted(trace_at, [start + 1, start + len(trials) + 1])
+        if hi > lo:                                     # some trace points fall into this chunk
+            sums = total + np.cumsum(trials, dtype=dtype)
+            counts = trace_at[lo:hi]
+            trace[lo:hi] = sums[counts - start - 1] / counts
+        total += np.sum(trials, dtype=dtype).item()
+
+    return total / n, np.column_stack((trace_at, trace))
+
+
+def plot_convergence(trace, true_value=0.5):
+    """Plots the trace of running_estimate() once, on a log scale."""
+    plt.figure()
+    plt.axhline(y=true_value, color='r', linestyle='-')
+    plt.plot(trace[:, 0], trace[:, 1])
+    plt.xscale("log")
+    plt.xlabel("Iterations")
+    plt.ylabel("Probability")
+    plt.show()
+
+
+def monte_carlo(n, rng=None):
+    """Flips a fair coin n times and plots how the probability of Tails converges. Returns the final probability."""
+    probability, trace = running_estimate(bernoulli(0.5), n, rng)
+    plot_convergence(trace, 0.5)
+    return probability
+
+
+if __name__ == "__main__":
+    flip5k = monte_carlo(5000)
+    print(flip5k)
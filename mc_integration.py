@@ -9,17 +9,290 @@ The monte carlo estimate of the integral is given by:
 # from scipy import random
 import numpy as np
 import matplotlib.pyplot as plt
+from statistics import NormalDist
+from math import gamma as gamma_fn
 
 
 def sinx(x):
     return np.sin(x)
 
 
-def main():
+class RunningStats:
+    """
+    Running mean and variance of a stream of samples that arrive in chunks (Welford's algorithm,
+    in the chunk-merging form of Chan et al.). Memory use does not depend on the number of samples.
+    A chunk can also be an (n, K) array of n samples of K quantities, which are tracked side by side.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0                                   # sum of squared differences from the mean
+
+    def update(self, samples):
+        n_chunk = len(samples)
+        if n_chunk == 0:
+            return
+        chunk_mean = np.mean(samples, axis=0)
+        chunk_m2 = np.sum((samples - chunk_mean) ** 2, axis=0)
+
+        n = self.n + n_chunk
+        delta = chunk_mean - self.mean
+        self.mean += delta * n_chunk / n
+        self.m2 += chunk_m2 + delta ** 2 * self.n * n_chunk / n
+        self.n = n
+
+    def variance(self):
+        """Unbiased sample variance."""
+        return self.m2 / (self.n - 1) if self.n > 1 else np.inf
+
+    def std_error(self):
+        """Standard error of the mean."""
+        return np.sqrt(self.variance() / self.n) if self.n > 0 else np.inf
+
+
+def integrate_box(integrands, lower, upper, n_samples=None, tol=None, confidence=0.95,
+                  chunk_size=None, max_samples=10 ** 8, rng=None):
+    """
+    Monte Carlo estimate of the integrals of K functions over the same d-dimensional box
+    [lower_1, upper_1] x ... x [lower_d, upper_d].
+
+    Every chunk of uniform points is generated once and shared by all K integrands, and the chunks
+    are small enough to stay in the CPU cache, so memory use does not depend on the number of samples.
+
+    Parameters:
+    integrands: a vectorized function mapping an (m, d) array of points to an (m, K) or (m,) array,
+                or a list of K functions that each map (m, d) points to (m,) values
+    lower, upper: (d,) arrays with the bounds of the box
+    n_samples: number of samples to draw. If None, sample until tol is reached
+    tol: stop once the half-width of the confidence interval of every integral is at most tol
+    confidence: confidence level of the interval, e.g. 0.95
+    chunk_size: number of points generated and evaluated at once. Defaults to ~256 kB of points
+    max_samples: upper limit on the number of samples when n_samples is not given
+    rng: seed or numpy Generator
+
+    Returns a dict with the (K,) arrays estimate, std_error and half_width, and n_samples,
+    the number of samples used.
+    """
+    rng = np.random.default_rng(rng)
+    lower = np.atleast_1d(np.asarray(lower, dtype=np.float64))
+    upper = np.atleast_1d(np.asarray(upper, dtype=np.float64))
+    dim = len(lower)
+    volume = np.prod(upper - lower)
+    if chunk_size is None:
+        chunk_size = max(1024, 2 ** 15 // dim)         # 2^15 float64 values = 256 kB of points
+    if n_samples is not None:
+        max_samples = n_samples
+    if callable(integrands):
+        evaluate = integrands
+    else:
+        evaluate = lambda x: np.column_stack([f(x) for f in integrands])
+    z = NormalDist().inv_cdf((1 + confidence) / 2)     # e.g. 1.96 for 95 %
+    stats = RunningStats()
+
+    while stats.n < max_samples:
+        n_chunk = min(chunk_size, max_samples - stats.n)
+        points = lower + (upper - lower) * rng.random((n_chunk, dim))
+        stats.update(volume * evaluate(points))         # each volume * f(x_i) is an unbiased estimate
+        if (n_samples is None and tol is not None and stats.n >= 2 * chunk_size
+                and np.all(z * stats.std_error() <= tol)):
+            break                                       # at least two chunks, so the variance estimate is stable
+
+    return {"estimate": np.atleast_1d(stats.mean),
+            "std_error": np.atleast_1d(stats.std_error()),
+            "half_width": np.atleast_1d(z * stats.std_error()),
+            "n_samples": stats.n}
+
+
+def integrate(f, int_a, int_b, tol=1e-3, confidence=0.95, chunk_size=10000, max_samples=10 ** 8, rng=None):
+    """
+    Monte Carlo estimate of the integral of f over [int_a, int_b] that keeps drawing chunks of
+    chunk_size uniform samples until the confidence interval is narrow enough.
+    The 1-dimensional, single integrand case of integrate_box().
+
+    Parameters:
+    f: vectorized integrand
+    int_a, int_b: limits of integration
+    tol: stop once the half-width of the confidence interval is at most tol
+    confidence: confidence level of the interval, e.g. 0.95
+    chunk_size: number of samples drawn and evaluated at once
+    max_samples: stop after this many samples even if tol has not been reached
+    rng: seed or numpy Generator
+
+    Returns a dict with the estimate, its std_error, the half_width of the confidence interval
+    and n_samples, the number of samples used.
+    """
+    result = integrate_box(lambda x: f(x[:, 0]), [int_a], [int_b], tol=tol, confidence=confidence,
+                           chunk_size=chunk_size, max_samples=max_samples, rng=rng)
+    return {"estimate": float(result["estimate"][0]),
+            "std_error": float(result["std_error"][0]),
+            "half_width": float(result["half_width"][0]),
+            "n_samples": result["n_samples"]}
+
+
+def streaming_main(rng=None):
+    result = integrate(sinx, 0.0, np.pi, tol=1e-3, rng=rng)
+    print("Integral of sin(x) in the limits [0, pi] = ", result["estimate"],
+          "+/-", result["half_width"], "(95 %) from", result["n_samples"], "samples")
+
+
+def batch_main(rng=None):
+    # integrals of sin(k x) sin(k y) over [0, pi] x [0, pi] for k = 1..5 from one set of samples.
+    # The true values are 4 / k^2 for odd k and 0 for even k.
+    k = np.arange(1, 6)
+    integrands = lambda x: np.sin(np.outer(x[:, 0], k)) * np.sin(np.outer(x[:, 1], k))     # (m, K)
+    result = integrate_box(integrands, [0.0, 0.0], [np.pi, np.pi], n_samples=10 ** 6, rng=rng)
+    for k_i, estimate, half_width in zip(k, result["estimate"], result["half_width"]):
+        print("k =", k_i, " integral =", estimate, "+/-", half_width)
+
+
+def beta_proposal(int_a, int_b, alpha=2.0, beta=2.0):
+    """
+    Proposal density for importance sampling: a Beta(alpha, beta) distribution stretched over [int_a, int_b].
+    The default Beta(2, 2) is a parabola that follows the shape of sin(x) on [0, pi].
+
+    Returns (sample, pdf): sample(n, rng) draws n points and pdf(x) evaluates the density.
+    """
+    width = int_b - int_a
+    norm = gamma_fn(alpha + beta) / (gamma_fn(alpha) * gamma_fn(beta))
+
+    def sample(n, rng):
+        return int_a + width * rng.beta(alpha, beta, n)
+
+    def pdf(x):
+        t = (x - int_a) / width
+        return norm * t ** (alpha - 1) * (1 - t) ** (beta - 1) / width
+
+    return sample, pdf
+
+
+def _plain(f, int_a, int_b, n, rng, **options):
+    xrand = rng.uniform(int_a, int_b, n)
+    return (int_b - int_a) * np.mean(f(xrand))
+
+
+def _importance(f, int_a, int_b, n, rng, proposal, **options):
+    sample, pdf = proposal
+    x = sample(n, rng)
+    return np.mean(f(x) / pdf(x))                       # E_q[f(x) / q(x)] = integral of f
+
+
+def _antithetic(f, int_a, int_b, n, rng, **options):
+    xrand = rng.uniform(int_a, int_b, max(n // 2, 1))
+    mirrored = int_a + int_b - xrand                    # the antithetic partner of every sample
+    return (int_b - int_a) * np.mean((f(xrand) + f(mirrored)) / 2)
+
+
+def _stratified(f, int_a, int_b, n, rng, **options):
+    u = (np.arange(n) + rng.random(n)) / n              # one uniform sample in each of n equal strata
+    return (int_b - int_a) * np.mean(f(int_a + (int_b - int_a) * u))
+
+
+def _latin_hypercube(f, int_a, int_b, n, rng, **options):
+    u = (rng.permutation(n) + rng.random(n)) / n        # the strata in random order
+    return (int_b - int_a) * np.mean(f(int_a + (int_b - int_a) * u))
+
+
+def _control_variate(f, int_a, int_b, n, rng, control, **options):
+    g, g_integral = control
+    xrand = rng.uniform(int_a, int_b, n)
+    y = (int_b - int_a) * f(xrand)
+    c = (int_b - int_a) * g(xrand)                      # unbiased estimates of the known g_integral
+    c_var = np.var(c)
+    beta = np.cov(y, c, bias=True)[0, 1] / c_var if c_var > 0 else 0.0     # optimal coefficient
+    return np.mean(y) - beta * (np.mean(c) - g_integral)
+
+
+def _quasi_random(engine):
+    def estimator(f, int_a, int_b, n, rng, **options):
+        from scipy.stats import qmc                     # only needed for the quasi-Monte Carlo methods
+        if engine == "sobol":
+            sampler = qmc.Sobol(d=1, scramble=True, seed=rng)
+            u = sampler.random_base2(int(np.log2(n)))   # n is a power of 2, see _sample_count()
+        else:
+            u = qmc.Halton(d=1, scramble=True, seed=rng).random(n)
+        return (int_b - int_a) * np.mean(f(int_a + (int_b - int_a) * u[:, 0]))
+    return estimator
+
+
+estimators = {"plain": _plain,
+              "importance": _importance,
+              "antithetic": _antithetic,
+              "stratified": _stratified,
+              "latin_hypercube": _latin_hypercube,
+              "control_variate": _control_variate,
+              "sobol": _quasi_random("sobol"),
+              "halton": _quasi_random("halton")}
+
+
+def _sample_count(method, n):
+    """Number of samples the estimator of 'method' actually uses when asked for n of them."""
+    if method == "sobol":
+        return 2 ** max(int(np.log2(n)), 1)             # Sobol points come in powers of 2
+    if method == "antithetic":
+        return 2 * max(n // 2, 1)                       # whole pairs
+    return n
+
+
+def integrate_vr(f, int_a, int_b, n_samples=10000, method="plain", replicates=16, rng=None, **options):
+    """
+    Monte Carlo estimate of the integral of f over [int_a, int_b] with a variance-reduction method.
+
+    Not all methods produce independent samples (stratified and quasi-random points are correlated
+    by design), so every method is run as 'replicates' independent replicates of
+    n_samples / replicates samples each. The estimate is the mean of the replicates and its
+    standard error comes from their spread.
+
+    Parameters:
+    f: vectorized integrand
+    int_a, int_b: limits of integration
+    n_samples: total number of samples over all the replicates
+    method: one of the keys of 'estimators':
+        plain: uniform samples
+        importance: samples from a proposal density, needs proposal=(sample, pdf), see beta_proposal()
+        antithetic: pairs of samples x and a + b - x
+        stratified: one uniform sample in each of n equal strata
+        latin_hypercube: stratified samples in random order
+        control_variate: needs control=(g, integral of g over [int_a, int_b]) for a function g close to f
+        sobol, halton: scrambled quasi-random points (needs scipy)
+    replicates: number of independent replicates
+    rng: seed or numpy Generator
+
+    Returns a dict with the estimate, its std_error, the n_samples actually used (Sobol points are
+    rounded down to a power of 2 per replicate, antithetic ones to whole pairs) and variance_reduction:
+    how many times smaller the variance per sample is than for plain MC on the same integrand, i.e.
+    how many times fewer samples the method needs for the same error.
+    """
+    rng = np.random.default_rng(rng)
+    n = _sample_count(method, max(n_samples // replicates, 2))      # per replicate, as actually drawn
+    estimates = np.array([estimators[method](f, int_a, int_b, n, rng, **options) for _ in range(replicates)])
+    std_error = np.std(estimates, ddof=1) / np.sqrt(replicates)
+
+    plain_variance = np.var((int_b - int_a) * f(rng.uniform(int_a, int_b, n * replicates)), ddof=1)
+    method_variance = std_error ** 2 * n * replicates                  # variance per sample of the method
+    return {"estimate": float(np.mean(estimates)),
+            "std_error": float(std_error),
+            "n_samples": n * replicates,
+            "variance_reduction": float(plain_variance / method_variance) if method_variance > 0 else np.inf}
+
+
+def variance_reduction_main(rng=None):
+    rng = np.random.default_rng(rng)
+    int_a, int_b = 0.0, np.pi
+    options = {"proposal": beta_proposal(int_a, int_b),
+               "control": (lambda x: x * (np.pi - x), np.pi ** 3 / 6)}     # parabola with a known integral
+    for method in estimators:
+        result = integrate_vr(sinx, int_a, int_b, 2 ** 14, method, rng=rng, **options)
+        print(method.ljust(16), result["estimate"], "+/-", result["std_error"],
+              " variance reduction =", result["variance_reduction"])
+
+
+def main(rng=None):
+    rng = np.random.default_rng(rng)                    # seed or Generator for reproducible runs
     int_a, int_b = 0.0, np.pi                           # limits of integration
     N = 10000                                           # how many samples?
 
-    xrand = np.random.uniform(int_a, int_b, N)          # randomly draw samples x_i's from a Uniform distibution N times
+    xrand = rng.uniform(int_a, int_b, N)          # randomly draw samples x_i's from a Uniform distibution N times
     y_x = sinx(xrand)                                   # f(x_i)'s
     summation = np.sum(y_x)                             # sum of all f(x_i)'s
     integral = (int_b * summation) / float(N)
@@ -27,24 +300,18 @@ def main():
     print("Integral of sin(x) in the limits [0, pi] = ", integral)
 
 
-def longer_main():
+def longer_main(rng=None):
     # the longer way of doing the same stuff as main() for plotting purposes:
+    rng = np.random.default_rng(rng)                    # seed or Generator for reproducible runs
 
     int_a, int_b = 0.0, np.pi                           # limits of integration
     N = 10000                                           # how many samples?
 
-    xrand = np.random.uniform(int_a, int_b, N)          # randomly draw samples x_i's from a Uniform distibution N times
-
-    summation = 0.0                                     # sum of all f(x_i)'s
-    y_x = []                                            # y = f(x_)
-    integrals = []                                      # save value of approx area after each iteration
-    for count, xs in enumerate(xrand):
-        f_x = sinx(xs)              # find f(x)
-        y_x.append(f_x)             # add that to list y
-        summation += f_x            # find sum of f(x)'s
+    xrand = rng.uniform(int_a, int_b, N)          # randomly draw samples x_i's from a Uniform distibution N times
 
-        integral = (int_b * summation) / float(count+1) 
-        integrals.append(integral)
+    y_x = sinx(xrand)                                   # y = f(x_i)
+    summation = np.cumsum(y_x)                          # sum of f(x)'s after each iteration
+    integrals = (int_b * summation) / np.arange(1, N + 1)   # approx area after each iteration
 
     plt.figure()
     plt.axhline(y=2.0, color='g', linestyle='dashed', label="True value")
@@ -56,14 +323,15 @@ def longer_main():
     plt.show()
 
 
-def repeated_main():
+def repeated_main(rng=None):
+    rng = np.random.default_rng(rng)                    # seed or Generator for reproducible runs
     int_a, int_b = 0.0, np.pi                           # limits of integration
     N = 10000                                           # how many samples?
     M = 1000                                            # how many iterations?
     areas = []                                          # save approximation of all M iterations
 
     for _ in range(M):
-        xrand = np.random.uniform(int_a, int_b, N)      # randomly draw samples x_i's from a Uniform distibution N times
+        xrand = rng.uniform(int_a, int_b, N)      # randomly draw samples x_i's from a Uniform distibution N times
         y_x = sinx(xrand)
 
         summation = np.sum(y_x)                         # sum of all f(x_i)'s
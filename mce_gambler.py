@@ -4,15 +4,16 @@ A small change on Sentdex's Monte Carlo Tutorials: https://pythonprogramming.net
 I have just taken each gabler's final result and mone transition and made a plot of them. Then finally to show
 that the house always wins, we take 1000 gamplers and have them play 100 times to see how much the house won.
 """
+import numpy as np
 import matplotlib.pyplot as plt
-import random
+from matplotlib.collections import LineCollection
 
 
-def roll_dice():
+def roll_dice(rng=None):
     """Rolling a dice between 1-100 and placing a bet on the outcome.
        If the number comes out to be in the range [51, 99], then the 
-       user wins or else the 'house ' wins. """
-    roll = random.randint(1, 100)                       # randomly picks a number N such that 1 <= N <= 100
+       user wins or else the 'house ' wins. rng is a seed or numpy Generator to roll with. """
+    roll = np.random.default_rng(rng).integers(1, 101)                         # randomly picks a number N such that 1 <= N <= 100
 
     if roll <= 50:                                      # house wins for number 1-50
         return False                                    # so false for the user
@@ -22,15 +23,16 @@ def roll_dice():
         return False                                    # user loses even when the number 100 appears
 
 
-def place_bet(funds, bet_amnt, bet_counts):
+def place_bet(funds, bet_amnt, bet_counts, rng=None):
     """A function that takes in 'funds' amount of money and places
        'bet_counts' number of bets of 'bet_amnt' money in each bet"""
+    rng = np.random.default_rng(rng)                    # seed or Generator for reproducible runs
     value = funds                                       # variable to hold the current about of money gambler has
     track_money = [value]                               # track change of money won/lost. first entry is starting money
 
     bet_count = 0                                       # total number of bets to be placed = bet_counts
     while bet_count < bet_counts:                       
-        if roll_dice():         
+        if roll_dice(rng):         
             value += bet_amnt                           # if user wins, the money they have increases by bet_amnt
         else:
             value -= bet_amnt                           # or decreases by bet_amnt, if they loose
@@ -39,7 +41,133 @@ def place_bet(funds, bet_amnt, bet_counts):
     return track_money                                  # return the progress after all bets have been placed
 
 
-def main():
+def roll_outcomes(n_gamblers, bet_counts, rng=None):
+    """Rolls the dice of roll_dice() for all the bets of all the gamblers at once.
+       Returns a (n_gamblers, bet_counts) boolean array, True where the gambler wins the bet."""
+    rng = np.random.default_rng(rng)
+    rolls = rng.integers(1, 101, (n_gamblers, bet_counts), dtype=np.int8)     # 1 <= N <= 100
+    return (rolls > 50) & (rolls < 100)                                     # user wins for 51-99 only
+
+
+def constant_bet(bet_amnt):
+    """Strategy: always bet bet_amnt."""
+    def strategy(money, last_bet, last_won):
+        return np.full_like(money, bet_amnt)
+    return strategy
+
+
+def martingale(bet_amnt):
+    """Strategy: double the bet after every loss and go back to bet_amnt after a win."""
+    def strategy(money, last_bet, last_won):
+        return np.where(last_won, bet_amnt, 2 * last_bet)
+    return strategy
+
+
+def fixed_fraction(fraction):
+    """Strategy: bet a fixed fraction of the current money."""
+    def strategy(money, last_bet, last_won):
+        return np.floor(fraction * money).astype(money.dtype)
+    return strategy
+
+
+def simulate_gamblers(n_gamblers, funds, bet_amnt, bet_counts, strategy=None, bankrupt=False, rng=None):
+    """A vectorized place_bet() for a whole population of gamblers.
+
+       With a constant bet the money paths are the cumulative sum of the +/- bet_amnt outcomes.
+       A strategy makes every bet depend on the previous one, so the bets are then played one after
+       the other, but still for all the gamblers at once. A strategy is a function
+       strategy(money, last_bet, last_won) -> bets, see constant_bet(), martingale() and fixed_fraction().
+
+       With bankrupt=True, nobody can bet more than they have, and a gambler who runs out of money
+       stops playing, i.e. 0 is an absorbing barrier.
+
+       Returns a (n_gamblers, bet_counts + 1) array with the money of every gambler after each bet.
+       The first column is the starting money."""
+    wins = roll_outcomes(n_gamblers, bet_counts, rng)
+    money = np.empty((n_gamblers, bet_counts + 1), dtype=np.int64)
+    money[:, 0] = funds
+
+    if strategy is None and bankrupt and funds % bet_amnt:
+        strategy = constant_bet(bet_amnt)           # the last bet can be cut short: play it bet by bet
+
+    if strategy is None:
+        np.cumsum(np.where(wins, bet_amnt, -bet_amnt), axis=1, out=money[:, 1:])
+        money[:, 1:] += funds
+        if bankrupt:
+            # the money stays a multiple of bet_amnt, so it hits exactly 0 and stays there
+            ruined = np.maximum.accumulate(money <= 0, axis=1)
+            money[ruined] = 0
+        return money
+
+    bets = np.full(n_gamblers, bet_amnt, dtype=np.int64)
+    won = np.ones(n_gamblers, dtype=bool)
+    for i in range(bet_counts):
+        bets = strategy(money[:, i], bets, won)
+        if bankrupt:
+            bets = np.clip(bets, 0, np.maximum(money[:, i], 0))            # cannot bet more than you have
+        won = wins[:, i]
+        money[:, i + 1] = money[:, i] + np.where(won, bets, -bets)
+    return money
+
+
+def house_edge_study(n_gamblers, funds, bet_amnt, bet_counts, strategy=None, bankrupt=False,
+                     rng=None, chunk_size=10000, percentiles=(5, 25, 50, 75, 95)):
+    """Runs simulate_gamblers() in chunks of chunk_size gamblers, so 10^5 to 10^6 gamblers fit in memory.
+
+       Returns a dict with:
+       house_money: total money won by the house
+       highest_win: the most money any gambler had at any point
+       ruined: number of gamblers who ran out of money
+       bands: (len(percentiles), bet_counts + 1) percentiles of the money after each bet, from the first chunk
+       paths: the money paths of the first chunk, e.g. for plot_gamblers()"""
+    rng = np.random.default_rng(rng)
+    study = {"house_money": 0, "highest_win": funds, "ruined": 0}
+    for start in range(0, n_gamblers, chunk_size):
+        money = simulate_gamblers(min(chunk_size, n_gamblers - start), funds, bet_amnt, bet_counts,
+                                  strategy, bankrupt, rng)
+        study["house_money"] += int(np.sum(money[:, 0] - money[:, -1]))
+        study["highest_win"] = max(study["highest_win"], int(np.max(money)))
+        study["ruined"] += int(np.count_nonzero(np.min(money, axis=1) <= 0))
+        if start == 0:
+            study["paths"] = money
+            study["bands"] = np.percentile(money, percentiles, axis=0)
+    return study
+
+
+def plot_gamblers(paths, funds, house_money, max_lines=1000, bands=None):
+    """Plots up to max_lines money paths as a single LineCollection, optionally with percentile bands."""
+    n_lines = min(max_lines, len(paths))
+    steps = np.arange(paths.shape[1])
+    segments = np.empty((n_lines, paths.shape[1], 2))
+    segments[:, :, 0] = steps
+    segments[:, :, 1] = paths[:n_lines]
+
+    fig, ax = plt.subplots()
+    ax.add_collection(LineCollection(segments, linewidths=0.5, alpha=0.3))
+    ax.autoscale()
+    ax.axhline(y=funds, color='g', linestyle='-')                   # mark a line where everyone started
+    if bands is not None:
+        for k in range(len(bands) // 2):                            # outer to inner pairs of percentiles
+            ax.fill_between(steps, bands[k], bands[-k - 1], color='orange', alpha=0.3)
+        if len(bands) % 2:
+            ax.plot(steps, bands[len(bands) // 2], color='red')     # the median
+
+    ax.text(0, np.max(paths[:n_lines]), "House final ammount = " + str(house_money))
+    ax.set_xlabel("Iterations")
+    ax.set_ylabel("Money")
+    plt.show()
+
+
+def main(rng=None):
+    repeat = 1000                                                   # how many gamblers do you want?
+    init_money = 10000                                              # initial money given to all
+    study = house_edge_study(repeat, init_money, 100, 1000, rng=rng)
+    plot_gamblers(study["paths"], init_money, study["house_money"], bands=study["bands"])
+
+
+def loop_main(rng=None):
+    # the original one-gambler-at-a-time simulation, to compare with main()
+    rng = np.random.default_rng(rng)                                # seed or Generator for reproducible runs
     house_money = []                                                # how much money did the house win/lose?
     repeat = 1000                                                     # how many gamblers do you want?
     init_money = 10000                                              # initial money given to all
@@ -49,7 +177,7 @@ def main():
     plt.axhline(y=init_money, color='g', linestyle='-')             # mark a line where everyone started
 
     for _ in range(repeat):        
-        track_money = place_bet(init_money, 100, 1000)               # list of money transition
+        track_money = place_bet(init_money, 100, 1000, rng)          # list of money transition
         if max(track_money) > highest_win:
             highest_win = max(track_money)
 
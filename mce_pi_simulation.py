@@ -5,85 +5,134 @@ We randomly place points in the range [-r, r] \times [-r, r], and count the part
 that fall inside the circle versus how many fall outside the circle.
 
 Taken form the tutorial Monte Carlo Simulations: https://medium.com/towards-artificial-intelligence/monte-carlo-simulation-an-in-depth-tutorial-with-python-bcf6eb7856c8
+
+The points are continuous uniform samples in [-1, 1) x [-1, 1), drawn in vectorized chunks and
+spread over a pool of worker processes, each with its own random stream split off a SeedSequence.
+Nothing is drawn while sampling; plotting the convergence or a sample of the points is an
+optional step afterwards. This also serves as the throughput benchmark of the MC core.
 """
+import os
 import math
-import turtle
-import random
+import time
+import numpy as np
 import matplotlib.pyplot as plt
-
-
-# visualise random points
-myPen = turtle.Turtle()
-myPen.hideturtle()
-myPen.speed(0)
-
-# draw the square
-myPen.up()
-myPen.setposition(-100, -100)
-myPen.down()
-myPen.fd(200)
-myPen.left(90)
-myPen.fd(200)
-
-myPen.left(90)
-myPen.fd(200)
-myPen.left(90)
-myPen.fd(200)
-myPen.left(90)
-
-# draw the circle
-myPen.up()
-myPen.setposition(0, -100)
-myPen.down()
-myPen.circle(100)
-
-
-in_circle = 0
-out_circle = 0
-
-pi_list = []
-
-plt.figure()
-plt.axhline(y=math.pi, linestyle='dashed', label="True value")
-
-for i in range(5):
-    plot_list = []
-    for j in range(1000):
-
-        # randomly generate the numbers
-        x = random.randrange(-100, 100)
-        y = random.randrange(-100, 100)
-
-        # check if they lie inside the circle
-        if (x**2 + y**2 > 100**2):
-            myPen.color("black")
-            myPen.up()
-            myPen.goto(x, y)
-            myPen.down()
-            myPen.dot()
-            out_circle += 1
-
-        else:
-            myPen.color("red")
-            myPen.up()
-            myPen.goto(x, y)
-            myPen.down()
-            myPen.dot()
-            in_circle += 1
-        
-
-        pi = 4 * in_circle / (in_circle + out_circle)
-
-        pi_list.append(pi)
-        plot_list.append(pi)
-
-        avg_pi_errors = [abs(math.pi - pi) for pi in pi_list]
-    label_txt = "Iteration " + str(i+1)
-    plt.plot(plot_list, label=label_txt)
-    print(pi_list[-1])
-
-plt.title(r'MC estimate for value of $\pi$')
-plt.xlabel("No. of iterations")
-plt.ylabel("Estimated value")
-plt.legend(loc="best")
-plt.show()
\ No newline at end of file
+from multiprocessing import Pool
+
+
+def count_in_circle(n_points, rng, chunk_size=2 ** 20):
+    """
+    Draws n_points uniform points in the square [-1, 1) x [-1, 1) in chunks of chunk_size and
+    counts the ones inside the unit circle.
+
+    Returns: array with the cumulative count of points inside the circle after every chunk
+    """
+    counts = []
+    inside = 0
+    for start in range(0, n_points, chunk_size):
+        n_chunk = min(chunk_size, n_points - start)
+        points = rng.random((2, n_chunk))
+        points *= 2
+        points -= 1
+        np.square(points, out=points)                   # in place, the chunk is the only large array
+        points[0] += points[1]
+        inside += int(np.count_nonzero(points[0] <= 1))
+        counts.append(inside)
+    return np.array(counts, dtype=np.int64)
+
+
+def _count_task(task):
+    """Pool task: count_in_circle with a worker-specific stream."""
+    n_points, seed_seq, chunk_size = task
+    return count_in_circle(n_points, np.random.default_rng(seed_seq), chunk_size)
+
+
+def estimate_pi(n_points, n_workers=None, chunk_size=2 ** 20, seed=None):
+    """
+    Estimates pi from n_points random points, split into one task per worker process.
+
+    Parameters:
+    n_points: total number of points
+    n_workers: number of worker processes. Defaults to the number of CPUs, 1 runs in this process
+    chunk_size: number of points generated at once by a worker
+    seed: seed or SeedSequence. Every task gets a child stream from SeedSequence.spawn(), so a run
+          is reproducible for a given seed and number of workers
+
+    Returns a dict with:
+    estimate: the estimate of pi
+    std_error: its standard error, 4 * sqrt(p (1 - p) / n) with p the fraction of points inside
+    n_points: number of points used
+    trace: (n_chunks, 2) array of (points so far, estimate so far), the convergence of the estimate
+    """
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    if n_workers is None:
+        n_workers = os.cpu_count()
+
+    bounds = np.linspace(0, n_points, n_workers + 1).astype(np.int64)
+    sizes = np.diff(bounds)
+    tasks = [(int(n), child, chunk_size) for n, child in zip(sizes, seed_seq.spawn(n_workers))]
+    if n_workers == 1:
+        counts = [_count_task(tasks[0])]
+    else:
+        with Pool(n_workers) as pool:
+            counts = pool.map(_count_task, tasks)
+
+    # convergence trace: the chunks of all the tasks, one task after the other
+    points, inside = [], []
+    inside_so_far = 0
+    for start, n, task_counts in zip(bounds[:-1], sizes, counts):
+        points.append(start + np.minimum(np.arange(1, len(task_counts) + 1) * chunk_size, n))
+        inside.append(inside_so_far + task_counts)
+        if len(task_counts):
+            inside_so_far += task_counts[-1]
+    points, inside = np.concatenate(points), np.concatenate(inside)
+
+    p = inside[-1] / n_points
+    return {"estimate": 4 * p,
+            "std_error": 4 * math.sqrt(p * (1 - p) / n_points),
+            "n_points": n_points,
+            "trace": np.column_stack((points, 4 * inside / points))}
+
+
+def plot_convergence(result, max_points=1000):
+    """Plots the convergence trace of estimate_pi() on at most max_points log-spaced points."""
+    trace = result["trace"]
+    keep = np.unique(np.geomspace(1, len(trace), min(max_points, len(trace))).astype(int) - 1)
+    points, estimates = trace[keep].T
+
+    plt.figure()
+    plt.axhline(y=math.pi, linestyle='dashed', label="True value")
+    plt.plot(points, estimates, label="MC estimate")
+    plt.xscale("log")
+    plt.title(r'MC estimate for value of $\pi$')
+    plt.xlabel("No. of points")
+    plt.ylabel("Estimated value")
+    plt.legend(loc="best")
+    plt.show()
+
+
+def plot_points(n_points=5000, rng=None):
+    """Shows n_points random points coloured by whether they are inside the circle, like the original turtle drawing."""
+    rng = np.random.default_rng(rng)
+    x, y = 2 * rng.random((2, n_points)) - 1
+    inside = x ** 2 + y ** 2 <= 1
+
+    fig, ax = plt.subplots()
+    ax.scatter(x[inside], y[inside], s=2, color="red")
+    ax.scatter(x[~inside], y[~inside], s=2, color="black")
+    ax.add_patch(plt.Circle((0, 0), 1, fill=False))
+    ax.set_aspect("equal")
+    plt.show()
+
+
+def main(n_points=10 ** 8, seed=None):
+    start = time.perf_counter()
+    result = estimate_pi(n_points, seed=seed)
+    elapsed = time.perf_counter() - start
+
+    print("pi =", result["estimate"], "+/-", result["std_error"])
+    print("{:.3g} points per second".format(n_points / elapsed))
+    plot_convergence(result)
+
+
+if __name__ == "__main__":
+    main()
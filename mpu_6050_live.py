@@ -1,33 +1,141 @@
 from matplotlib.animation import FuncAnimation
 import matplotlib.pyplot as plt
-from itertools import count
+import numpy as np
 import pandas as pd
-import random
+import io
+import os
 
 
 plt.style.use('fivethirtyeight')
-x_val = []
-y_val = []
 
-index = count()
 
-def animate(i):
-    data = pd.read_csv('data.csv')
-    x = data["x_value"]
-    y1 = data["total_1"]
-    y2 = data["total_2"]
+class CsvTail:
+    """
+    Follows a csv file that is being appended to, like 'tail -f'. Remembers the byte offset it has
+    read up to, so every call of read_new() only parses the rows appended since the last call.
+    """
 
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0                                 # byte offset of the first unread row
+        self.header = None                              # column names, from the first line of the file
+        self.header_line = None                         # raw first line, to recognize a rewritten file
+        self.inode = None                               # inode of the file being followed
+        self.restarted = False                          # set when the file was truncated or replaced
 
-    # x_val.append(next(index))
-    # y_val.append(random.randint(0, 5))
+    def _start_over(self):
+        self.offset = 0
+        self.header = None
+        self.header_line = None
+        self.restarted = True
 
-    plt.cla()
-    plt.plot(x, y1, label='Channel 1')
-    plt.plot(x, y2, label='Channel 2')
+    def read_new(self):
+        """
+        Returns a DataFrame with the complete rows appended since the last call (possibly empty).
+        A row that is still being written, i.e. without its trailing newline, is left for the next call.
+        The file is read from the start again when it got smaller, was replaced by another file (a new
+        inode) or was rewritten with a different header line.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return pd.DataFrame(columns=self.header)
+        with f:
+            stat = os.fstat(f.fileno())
+            if self.offset > 0 and (stat.st_ino != self.inode or stat.st_size < self.offset
+                                    or f.read(len(self.header_line)) != self.header_line):
+                self._start_over()
+            self.inode = stat.st_ino
+            f.seek(self.offset)
+            new_bytes = f.read()
+        end = new_bytes.rfind(b'\n') + 1                # only consume up to the last complete line
+        if end == 0:
+            return pd.DataFrame(columns=self.header)
+        self.offset += end
+        text = new_bytes[:end].decode()
 
+        if self.header is None:
+            first_line, _, text = text.partition('\n')
+            self.header = first_line.strip().split(',')
+            self.header_line = first_line.encode() + b'\n'
+        if not text:
+            return pd.DataFrame(columns=self.header)
+        return pd.read_csv(io.StringIO(text), header=None, names=self.header)
+
+
+class LiveSeries:
+    """
+    Growable numpy buffer for the x values and the channels of the plot, with running minima and
+    maxima. The capacity doubles when it is full, so appending k rows costs O(k) amortized. The lines
+    are given views of the filled part, so no history list is converted into arrays on a refresh, and
+    the axis limits come from the running extrema instead of a rescan of the line data.
+    """
+
+    def __init__(self, n_channels=2, capacity=1024):
+        self.data = np.empty((n_channels + 1, capacity))   # row 0 holds x, the other rows the channels
+        self.clear()
+
+    def clear(self):
+        """Drops all the rows, keeping the buffer."""
+        self.n = 0
+        self.lower = np.full(2, np.inf)                 # running [x, y] minima over all the channels
+        self.upper = np.full(2, -np.inf)                # running [x, y] maxima
+
+    def append(self, rows):
+        """Appends a (n_channels + 1, k) block of new values and updates the running limits."""
+        k = rows.shape[1]
+        if self.n + k > self.data.shape[1]:
+            grown = np.empty((self.data.shape[0], max(2 * self.data.shape[1], self.n + k)))
+            grown[:, :self.n] = self.data[:, :self.n]
+            self.data = grown
+        self.data[:, self.n:self.n + k] = rows
+        self.n += k
+
+        # fmin/fmax skip NaN, so an empty field in the csv does not poison the limits
+        self.lower = np.fmin(self.lower, [np.fmin.reduce(rows[0]), np.fmin.reduce(rows[1:], axis=None)])
+        self.upper = np.fmax(self.upper, [np.fmax.reduce(rows[0]), np.fmax.reduce(rows[1:], axis=None)])
+
+    def x(self):
+        return self.data[0, :self.n]
+
+    def channel(self, c):
+        return self.data[c + 1, :self.n]
+
+
+def _padded(lower, upper):
+    """Axis limits around [lower, upper] with a 5% margin, and a non-empty range for a single value."""
+    pad = 0.05 * (upper - lower) if upper > lower else 0.5
+    return lower - pad, upper + pad
+
+
+def animate(i, tail, series, lines, ax):
+    """Appends the new rows of the file to the existing lines, instead of redrawing the whole axes."""
+    data = tail.read_new()
+    if tail.restarted:                                  # a new file: drop the old series
+        tail.restarted = False
+        series.clear()
+    if len(data) == 0:
+        return lines
+
+    series.append(data[["x_value", "total_1", "total_2"]].to_numpy(dtype=np.float64).T)
+    for c, line in enumerate(lines):
+        line.set_data(series.x(), series.channel(c))
+    if np.all(np.isfinite(series.lower)) and np.all(np.isfinite(series.upper)):     # not only NaN so far
+        ax.set_xlim(*_padded(series.lower[0], series.upper[0]))     # running limits, no rescan of the lines
+        ax.set_ylim(*_padded(series.lower[1], series.upper[1]))
+    return lines
+
+
+def main():
+    fig, ax = plt.subplots()
+    line1, = ax.plot([], [], label='Channel 1')
+    line2, = ax.plot([], [], label='Channel 2')
     plt.tight_layout()
     plt.legend(loc="upper left")
 
-live = FuncAnimation(plt.gcf(), animate, interval=1000)
-# plt.plot(x_val, y_val)
-plt.show()
+    live = FuncAnimation(fig, animate, fargs=(CsvTail('data.csv'), LiveSeries(2), (line1, line2), ax), interval=1000)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
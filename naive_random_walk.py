@@ -5,12 +5,16 @@ so that the final distance from the start is 4 or less. If its more
 than 4 then you neeed a transport back home. 
 """
 
-import random
+import numpy as np
 
-def random_walk(steps):
+directions = ['N', 'S', 'E', 'W']
+moves = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+def random_walk(steps, rng=None):
+    rng = np.random.default_rng(rng)
     x, y = 0, 0
     for _ in range(steps):
-        step = random.choice(['N', 'S', 'E', 'W'])
+        step = directions[rng.integers(4)]
         if step == 'N':
             y += 1
         elif step == 'S':
@@ -21,28 +25,75 @@ def random_walk(steps):
             x -= 1
     return (x, y)
 
-def comp_random_walk(steps):
-    """Return coordinates after 'steps' amount of random walks"""
+def comp_random_walk(steps, rng=None):
+    """Return coordinates after 'steps' amount of random walks, drawn from the seed or Generator rng"""
+    rng = np.random.default_rng(rng)
     x, y = 0, 0
     for _ in range(steps):
-        (dx, dy) = random.choice([(0, 1), (0, -1), (1, 0), (-1, 0)])
+        (dx, dy) = moves[rng.integers(4)]
         x += dx
         y += dy
     return x, y
 
 
-def naive_RW():
+def naive_RW(rng=None):
+    rng = np.random.default_rng(rng)
     for _ in range(25):
-        walk = comp_random_walk(10)
+        walk = comp_random_walk(10, rng)
         print(walk, "Distance =", abs(walk[0]) + abs(walk[1]))
 
 
-def main():
+def batch_random_walks(number_of_walks, max_length, rng=None):
+    """
+    Simulates number_of_walks walks of max_length steps at once. All the steps are drawn as one
+    integer matrix and the positions come from a cumulative sum over the steps, so column k-1 holds
+    the positions after k steps: every walk length up to max_length comes from the same walks.
+
+    Returns x, y: (number_of_walks, max_length) arrays of the coordinates after each step
+    """
+    rng = np.random.default_rng(rng)
+    steps = rng.integers(0, 4, (number_of_walks, max_length), dtype=np.int8)   # index into moves
+    dx = np.array([dx for dx, _ in moves], dtype=np.int16)
+    dy = np.array([dy for _, dy in moves], dtype=np.int16)
+    x = np.cumsum(dx[steps], axis=1, dtype=np.int16)
+    y = np.cumsum(dy[steps], axis=1, dtype=np.int16)
+    return x, y
+
+
+def no_transport_table(number_of_walks, max_length=30, max_distance=4, rng=None, chunk_size=100000):
+    """
+    Fraction of walks that end at most max_distance (Manhattan distance) from the start,
+    for every walk length 1..max_length.
+
+    The walks are simulated in chunks of chunk_size with batch_random_walks(), which keeps the
+    memory bounded for millions of walks.
+
+    Returns: (max_length,) array, entry k-1 is the fraction for walks of length k
+    """
+    rng = np.random.default_rng(rng)
+    no_transport = np.zeros(max_length, dtype=np.int64)
+    for start in range(0, number_of_walks, chunk_size):
+        x, y = batch_random_walks(min(chunk_size, number_of_walks - start), max_length, rng)
+        no_transport += np.count_nonzero(np.abs(x) + np.abs(y) <= max_distance, axis=0)
+    return no_transport / number_of_walks
+
+
+def main(rng=None):
+    number_of_walks = 30000
+    no_trans_percent = no_transport_table(number_of_walks, 30, 4, rng)    # all 30 walk lengths in one pass
+    for walk_length, percent in enumerate(no_trans_percent, start=1):
+        print("Walk size =", walk_length, 
+              " and % of no transports =", percent * 100)           # print it for each walk
+
+
+def loop_main(rng=None):
+    # the original one-walk-at-a-time simulation, to compare with main()
+    rng = np.random.default_rng(rng)                                # seed or Generator for reproducible runs
     number_of_walks = 30000
     for walk_length in range(1, 31):                                # Increase number of steps every time
         no_transport = 0                                            # Count the number of times we do not need a transport
         for _ in range(number_of_walks):                            # MC number_of_walks times simulation
-            (x, y) = comp_random_walk(walk_length)                  # randomly walk walk_length steps
+            (x, y) = comp_random_walk(walk_length, rng)             # randomly walk walk_length steps
             distance = abs(x) + abs(y)                              # calculate distance from start point
             if distance <= 4:                               
                 no_transport += 1                                   # increase counter if no transport needed
@@ -0,0 +1,250 @@
+"""
+Particle filter for very large particle counts (N = 1e6 and up), with the particle population
+split across a pool of worker processes.
+
+The particles, log weights, weights and resampling indices live in multiprocessing.shared_memory
+blocks that every worker maps as NumPy arrays, so nothing but a few scalars is sent between
+processes. Every worker predicts and weighs its own contiguous slice of the particles. A time step
+needs one global reduction, the log-sum-exp of the weights and the effective sample size, which
+the main process assembles from the per-slice partial sums.
+
+Resampling is systematic (low variance) resampling: a single random offset u places the N
+positions (u + i) / N, so every worker can find the positions that fall inside its own slice of
+the cumulative weights and search for them locally. The result is distributed exactly like
+resampling.systematic_resample on the whole population.
+"""
+import os
+import numpy as np
+from multiprocessing import Pool, shared_memory
+import particle_filter as pf                            # the tilt/bias model
+import samples_and_measurements as sm
+
+_shared = {}                                            # the worker's views on the shared arrays
+
+
+def _shared_arrays(names, n_samples, dim):
+    """Maps the shared memory blocks 'names' to the named NumPy arrays used by the filter."""
+    layout = {"particles": ((2, n_samples, dim), np.float64),    # ping-pong particle buffers
+              "log_weights": ((n_samples,), np.float64),
+              "weights": ((n_samples,), np.float64),
+              "indices": ((n_samples,), np.intp)}
+    blocks, arrays = {}, {}
+    for key, (shape, dtype) in layout.items():
+        if names is None:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            blocks[key] = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            blocks[key] = shared_memory.SharedMemory(name=names[key])
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+    return blocks, arrays
+
+
+def _init_worker(names, n_samples, dim):
+    """Pool initializer: attaches the worker to the shared memory blocks once."""
+    blocks, arrays = _shared_arrays(names, n_samples, dim)
+    _shared["blocks"] = blocks                          # keep the blocks alive with the process
+    _shared.update(arrays)
+
+
+def _predict_and_weigh(task):
+    """
+    Propagates the slice [lo, hi) of the current particles through the motion model into the other
+    buffer and adds its log likelihoods to the log weights.
+
+    Returns the partial sums needed for the global normalization: the largest log weight m_k of the
+    slice, sum(exp(log w - m_k)) and sum(exp(2 (log w - m_k))).
+    """
+    lo, hi, current, measurement_t, seed_seq = task
+    rng = np.random.default_rng(seed_seq)
+    particles = _shared["particles"][current, lo:hi]
+    pred_state = _shared["particles"][1 - current, lo:hi]
+
+    np.matmul(particles, pf.Ad.T, out=pred_state)
+    pred_state += rng.standard_normal(particles.shape) @ pf.Qd_chol.T
+
+    log_weights = _shared["log_weights"][lo:hi]
+    log_weights += pf.state_log_likelihood_batch(measurement_t, pred_state)
+
+    max_log_weight = np.max(log_weights)
+    if not np.isfinite(max_log_weight):
+        return -np.inf, 0.0, 0.0
+    scaled = np.exp(log_weights - max_log_weight)
+    return max_log_weight, np.sum(scaled), np.dot(scaled, scaled)
+
+
+def _normalize_and_search(task):
+    """
+    Normalizes the log weights of the slice [lo, hi) with the global log normalizer. If u is given,
+    also finds the systematic resampling positions (u + i) / N that fall inside the slice's share
+    (cum_lo, cum_hi] of the cumulative weights and writes their indices.
+    """
+    lo, hi, log_normalizer, u, cum_lo, cum_hi = task
+    n_samples = _shared["weights"].shape[0]
+    log_weights = _shared["log_weights"][lo:hi]
+    weights = _shared["weights"][lo:hi]
+
+    log_weights -= log_normalizer
+    np.exp(log_weights, out=weights)
+    if u is None:
+        return
+
+    first = min(max(int(np.floor(cum_lo * n_samples - u)) + 1, 0), n_samples)
+    last = min(max(int(np.floor(cum_hi * n_samples - u)) + 1, 0), n_samples)
+    if first == last:
+        return                                          # no position lands on this slice
+    positions = (u + np.arange(first, last)) / n_samples
+    local_indices = np.searchsorted(cum_lo + np.cumsum(weights), positions)
+    np.minimum(local_indices, hi - lo - 1, out=local_indices)   # guard against round-off at cum_hi
+    _shared["indices"][first:last] = lo + local_indices
+
+
+def _gather(task):
+    """Copies the resampled particles of the output slice [lo, hi) into the other buffer and resets their weights."""
+    lo, hi, current = task
+    n_samples = _shared["weights"].shape[0]
+    particles = _shared["particles"]
+    np.take(particles[current], _shared["indices"][lo:hi], axis=0, out=particles[1 - current, lo:hi])
+    _shared["log_weights"][lo:hi] = -np.log(n_samples)
+    _shared["weights"][lo:hi] = 1 / n_samples
+
+
+class ParallelParticleFilter:
+    """
+    Process-parallel version of particle_filter.ParticleFilter with the same step(), estimate() and
+    reset() interface. The shared memory and the worker pool are released by close(), or by using
+    the filter as a context manager.
+    """
+
+    def __init__(self, n_samples=1000000, n_workers=None, init_low=-3, init_high=3,
+                 ess_fraction=pf.resample_fraction, seed=None):
+        """
+        Parameters:
+        n_samples: number of particles N
+        n_workers: number of worker processes. Defaults to the number of CPUs
+        init_low, init_high: interval [init_low, init_high) the initial particles are uniformly drawn from
+        ess_fraction: resample only when the effective sample size drops below ess_fraction * N
+        seed: seed or SeedSequence every random draw of the filter is derived from, through SeedSequence.spawn()
+        """
+        self.n_samples = n_samples
+        self.dim = pf.Ad.shape[0]
+        self.init_low, self.init_high = init_low, init_high
+        self.ess_fraction = ess_fraction
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_seq = seed
+        else:
+            self.seed_seq = np.random.SeedSequence(seed)
+        main_seq, self._step_seq = self.seed_seq.spawn(2)
+        self.rng = np.random.default_rng(main_seq)                      # the main process' own stream
+
+        self._blocks, arrays = _shared_arrays(None, n_samples, self.dim)
+        self._particles = arrays["particles"]
+        self.log_weights = arrays["log_weights"]
+        self.weights = arrays["weights"]
+        self._current = 0
+
+        if n_workers is None:
+            n_workers = os.cpu_count()
+        names = {key: block.name for key, block in self._blocks.items()}
+        self._pool = Pool(n_workers, initializer=_init_worker, initargs=(names, n_samples, self.dim))
+        bounds = np.linspace(0, n_samples, n_workers + 1).astype(int)       # one slice per worker
+        self._slices = list(zip(bounds[:-1], bounds[1:]))
+
+        self.reset()
+
+    @property
+    def particles(self):
+        """(N, 3) view of the current particle set."""
+        return self._particles[self._current]
+
+    def reset(self, particles=None):
+        """
+        Reinitialises the filter with uniform weights.
+
+        Parameters:
+        particles: optional (N, 3) array of initial particles. If not given, the particles are drawn
+                   uniformly from [init_low, init_high)
+        """
+        if particles is None:
+            particles = self.rng.uniform(self.init_low, self.init_high, (self.n_samples, self.dim))
+        self.particles[:] = particles
+        self.log_weights.fill(-np.log(self.n_samples))
+        self.weights.fill(1 / self.n_samples)
+        self.steps = 0
+        self.resample_count = 0
+
+    def step(self, measurement_t):
+        """
+        Runs one predict, weight and (if needed) resample cycle of the filter across the workers.
+
+        Parameters:
+        measurement_t: Array of the measurements [z_theta, z_dtheta]
+
+        Returns True if the particles were resampled in this step.
+        """
+        # every slice gets its own stream, spawned in (step, slice) order, so the result does not
+        # depend on which worker happens to pick up which slice
+        seeds = self._step_seq.spawn(len(self._slices))
+        tasks = [(lo, hi, self._current, measurement_t, seed) for (lo, hi), seed in zip(self._slices, seeds)]
+        partial_sums = np.array(self._pool.map(_predict_and_weigh, tasks))
+        self._current = 1 - self._current
+        self.steps += 1
+
+        # global log-sum-exp and effective sample size from the per-slice partial sums
+        max_log_weights, sums, squares = partial_sums.T
+        max_log_weight = np.max(max_log_weights)
+        if not np.isfinite(max_log_weight):
+            self.log_weights.fill(-np.log(self.n_samples))      # no particle is plausible: start over uniformly
+            self.weights.fill(1 / self.n_samples)
+            return False
+        sums = sums * np.exp(max_log_weights - max_log_weight)
+        squares = squares * np.exp(2 * (max_log_weights - max_log_weight))
+        weight_sum = np.sum(sums)
+        log_normalizer = max_log_weight + np.log(weight_sum)
+        resample = weight_sum ** 2 / np.sum(squares) < self.ess_fraction * self.n_samples
+
+        u = self.rng.random() if resample else None
+        cumulative = np.concatenate(([0.0], np.cumsum(sums) / weight_sum))
+        cumulative[-1] = 1.0
+        tasks = [(lo, hi, log_normalizer, u, cumulative[k], cumulative[k + 1])
+                 for k, (lo, hi) in enumerate(self._slices)]
+        self._pool.map(_normalize_and_search, tasks)
+        if not resample:
+            return False
+
+        self._pool.map(_gather, [(lo, hi, self._current) for lo, hi in self._slices])
+        self._current = 1 - self._current
+        self.resample_count += 1
+        return True
+
+    def estimate(self):
+        """Returns the weighted mean of the particle set, i.e. the state estimate [dtheta, theta, bias]."""
+        return self.weights @ self.particles
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        self._pool.close()
+        self._pool.join()
+        self._particles = self.log_weights = self.weights = None    # drop the views before closing the buffers
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    z_theta, z_dtheta = sm.retreive_data(0)                     # measurements; unit rad, rad/sec
+
+    with ParallelParticleFilter(n_samples=1000000, seed=0) as ppf:
+        for t in range(len(z_theta)):
+            ppf.step(np.array([z_theta[t], z_dtheta[t]]))
+        print("Final estimate:", ppf.estimate())
+        print("Resampled", ppf.resample_count, "times in", ppf.steps, "steps")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from filterpy import monte_carlo                        # for resampling 
+import resampling                                       # vectorized resampling schemes
+import particle_store                                   # binary store of the particle sets of a run
 import samples_and_measurements as sm                   # custom script to load data from the csv
-from matplotlib.animation import FuncAnimation
 
 # Global contants needed throughout
 deg2rad = np.pi / 180                                   # multiply to convert to radians
@@ -11,7 +10,28 @@ T = 0.01                                                # sampling time. new mea
 I = np.identity(3)                                      # identity matrix
 zero_mean = np.array([0.0, 0.0, 0.0])                   # to construct any N(0, Cov) and draw samples from it 
 # np.random.seed(0)                                       # ensures we get the same random results each time
-count = 0
+resample_fraction = 0.5                                 # resample only when ESS < resample_fraction * N
+
+
+# contants and matrices for motion model
+qw = 5                                                  # uncertainty in w := dtheta
+qb = 0.01                                               # uncertainty in bias
+q_01 = (T ** 2) * qw / 2
+Qd = np.array([[T * qw, q_01, 0],                       # motion covariance
+               [q_01, (T ** 3) * qw / 3, 0],
+               [0, 0, T * qb]])
+Ad = np.array([[1, 0, 0], [T, 1, 0], [0, 0, 1]])        # state transition model
+Qd_chol = np.linalg.cholesky(Qd)                        # Qd = L L^T, to colour standard normal noise
+
+# constants for the measurement model
+rw = 10 ** (-6)                                         # uncetrainty in gyro measurements
+r_theta = 5 * (10 ** (-5))                              # uncertainty in accel. measurements
+Rd = np.array([[r_theta, 0],                            # measurement covariance
+               [0, rw]])
+C = np.array([[0, 1, 0], [1, 0, 1]])                    # measurement matrix
+Rd_inv = np.linalg.inv(Rd)                              # inverse of the measurement covariance
+Rd_norm = (2 * np.pi) ** (-Rd.shape[0] / 2) * np.linalg.det(Rd) ** (-1/2)   # normalising constant of N(Cx, Rd)
+Rd_log_norm = np.log(Rd_norm)                           # same constant in the log domain
 
 
 def state_likelihood(measurement_t, state_t):
@@ -28,164 +48,409 @@ def state_likelihood(measurement_t, state_t):
 
     where mu is the expected measurement C*x_t
     """
-    # constants for the measurement model
-    rw = 10 ** (-6)                                 # uncetrainty in gyro measurements
-    r_theta = 5 * (10 ** (-5))                      # uncertainty in accel. measurements
-    Rd = np.array([[r_theta, 0],                    # measurement covariance
-                   [0, rw]])
-    C = np.array([[0, 1, 0], [1, 0, 1]])            # measurement matrix
+    return state_likelihood_batch(measurement_t, state_t[np.newaxis, :])[0]
 
 
-    # obs_noise = np.random.multivariate_normal(expected_zt, Rd)      # drawing sample from ~ N(Cxt, Rd)
+def state_likelihood_batch(measurement_t, particles):
+    """
+    Vectorized version of state_likelihood: scores every particle against measurement_t
+    with a single evaluation of the gaussian N(C x, Rd).
+
+    Parameters:
+    measurement_t: 2x1 vector of the observed measurement
+    particles: (N, 3) array of hypothetical states
+
+    Returns: (N,) array of likelihoods p(z_t | x^{[n]}_t)
+    """
+    z_mean_diff = measurement_t - particles @ C.T                               # (N, 2) innovation of every particle
+    mahalanobis = np.einsum("ij,jk,ik->i", z_mean_diff, Rd_inv, z_mean_diff)    # (z - mu)^T . cov^(-1) . (z - mu) per row
+    return Rd_norm * np.exp(-0.5 * mahalanobis)
+
+
+def state_log_likelihood_batch(measurement_t, particles):
+    """
+    Log-domain version of state_likelihood_batch. Returns log p(z_t | x^{[n]}_t) for every
+    particle, which stays finite even when the densities themselves underflow to 0.
+
+    Parameters:
+    measurement_t: 2x1 vector of the observed measurement
+    particles: (N, 3) array of hypothetical states
+
+    Returns: (N,) array of log likelihoods
+    """
+    z_mean_diff = measurement_t - particles @ C.T
+    mahalanobis = np.einsum("ij,jk,ik->i", z_mean_diff, Rd_inv, z_mean_diff)
+    return Rd_log_norm - 0.5 * mahalanobis
 
-    expected_zt = np.dot(C, state_t)                                # expected z_t for each hyp. particle x_t
-    k = measurement_t.size                                          # dimension of the vector 
-    e1 = (2 * np.pi) ** (-k/2)                                      # first expression of likelihood
 
-    cov_sqrt_det = np.linalg.det(Rd) ** (-1/2)     # square root of the determinant of covariance matrix
-    cov_inverse = np.linalg.inv(Rd)                # inverse of the covariance matrix
+def normalize_log_weights(log_weights):
+    """
+    Normalizes log weights with the log-sum-exp trick: the largest log weight is subtracted
+    before exponentiating, so at least one particle always gets weight 1 before normalization.
 
-    z_mean_diff = (measurement_t - expected_zt)                                                  # difference between observed and expected measurement
-    z_mean_diff_T = (measurement_t - expected_zt).T                                              # transpose of above
-    exponential = np.exp(-0.5 * (z_mean_diff_T @ cov_inverse @ z_mean_diff))    # exponential part of the likelihood function
+    Parameters:
+    log_weights: (N,) array of unnormalized log weights
 
-    likelihood = e1 * cov_sqrt_det * exponential                                # the likelihood L(z_t)
-    return likelihood
+    Returns:
+    log_weights: (N,) array of normalized log weights, i.e. log w - logsumexp(log w)
+    weights: (N,) array of normalized weights that sum to 1
 
+    Raises ValueError if no log weight is finite, i.e. every particle is impossible.
+    """
+    max_log_weight = np.max(log_weights)
+    if not np.isfinite(max_log_weight):
+        raise ValueError("All log weights are non-finite.")
 
-def sample_motion_model(particle_n):
+    weights = np.exp(log_weights - max_log_weight)          # in (0, 1], the largest one is exactly 1
+    weight_sum = np.sum(weights)
+    log_weights = log_weights - (max_log_weight + np.log(weight_sum))
+    weights /= weight_sum
+    return log_weights, weights
+
+
+def sample_motion_model(particle_n, rng=None):
     """
     Propagates particle_n through the motion model and adds a gaussian noise.
     
     Parameters:
     particle_n: Hypothetical state vector; i.e the nth particle at time t x^{[n]}_t 
+    rng: optional numpy Generator to draw the noise from. Defaults to the global np.random state
     
     Returns xn_t1: state vector at time t+1 x^{[n]}_{t+1}
     """
-    # contants and matrices for motion model
-    qw = 5                                          # uncertainty in w := dtheta
-    qb = 0.01                                       # uncertainty in bias 
-    q_01 = (T ** 2) * qw / 2
-    Qd = np.array([[T * qw, q_01, 0],               # motion covariance
-                   [q_01, (T ** 3) * qw / 3, 0], 
-                   [0, 0, T * qb]])
-    Ad = np.array([[1, 0, 0], [T, 1, 0], [0, 0, 1]])        # state transition model
-    
-    motion_noise = np.random.multivariate_normal(zero_mean, Qd)     # adding motion noise ~ N(0, Qd)
-    xn_t1 = np.dot(Ad, particle_n.T) + motion_noise                 # hypothetical nth particle state at time t + 1
+    return sample_motion_model_batch(particle_n[np.newaxis, :], rng=rng)[0]
 
-    return xn_t1
+
+def sample_motion_model_batch(particles, out=None, rng=None):
+    """
+    Vectorized version of sample_motion_model: propagates the whole particle set with
+    one matrix multiply and one bulk draw of the motion noise ~ N(0, Qd).
+
+    Parameters:
+    particles: (N, 3) array of particles at time t
+    out: optional (N, 3) array to write the propagated particles into
+    rng: optional numpy Generator to draw the noise from. Defaults to the global np.random state
+
+    Returns: (N, 3) array of particles at time t+1
+    """
+    rng = np.random if rng is None else rng
+    motion_noise = rng.standard_normal(particles.shape) @ Qd_chol.T      # rows are samples of N(0, Qd)
+    out = np.matmul(particles, Ad.T, out=out)                                   # x_{t+1} = Ad x_t for every row
+    out += motion_noise
+    return out
 
 
-def particle_filter(particle_set_t, measurement_t):
+def particle_filter(particle_set_t, measurement_t, log_weights_t=None, ess_fraction=resample_fraction, rng=None):
     """
     Bare-bones particle filter algorithm.
     Takes, as input, the particle set from previous time step and returns the particle set for the next time step.
 
+    The particles are only resampled when the effective sample size 1 / sum(w^2) drops below
+    ess_fraction * N. Otherwise the particles are kept as they are and their weights are carried
+    over to the next time step.
+
     Parameters:
     particle_set_t: Array of vectors. Each vector is a state hypothesis and so is of the same dimesion
                     as the state itself.
 
     measurement_t:  Array of the measurements [z_theta, z_dtheta]
 
+    log_weights_t:  Normalized log weights of particle_set_t. None means uniform weights, i.e. a
+                    freshly resampled set.
+
+    ess_fraction:   Fraction of N below which the effective sample size triggers resampling.
+                    1.0 resamples at every time step.
+
+    rng:            Optional numpy Generator for all the random draws. Defaults to the global np.random state
+
     Returns: 
     particle_set_t1: Array of vectors estimated to be the state in next time step
+    log_weights_t1:  Normalized log weights of particle_set_t1, or None if it was just resampled
     """
-    global count
-    n_samples, dim = particle_set_t.shape                           # no of particles and dimension of each particle
+    n_samples = particle_set_t.shape[0]                             # no of particles
+
+    # \bar{X_t}, i.e. the predicted belief, for all particles at once
+    pred_state = sample_motion_model_batch(particle_set_t, rng=rng)          # predicted motion step: (N, 3)
+    log_weights = state_log_likelihood_batch(measurement_t, pred_state)    # measurement correction step: (N,)
+    if log_weights_t is not None:
+        log_weights += log_weights_t                            # w_t1 = w_t * p(z_t | x_t)
+
+    # Weights are normalized in the log domain, so they no longer underflow to 0 when the
+    # particles are far from the measurement. Only if no particle has a finite log weight
+    # (e.g. NaN states) do we fall back to a uniform distribution.
+    try:
+        log_weights, weights = normalize_log_weights(log_weights)
+    except ValueError:
+        print("possile divergence!")
+        weights = np.full(n_samples, 1 / n_samples)             # uniform distribution throughout
+        log_weights = np.log(weights)
 
-    pred_state = np.zeros((n_samples, dim), dtype="float64")        # store the predicted state 
-    weights = np.zeros(n_samples, dtype="float64")                  # corresponding weights for resampling
+    if resampling.effective_sample_size(weights) >= ess_fraction * n_samples:
+        return pred_state, log_weights                          # weights are still healthy, skip resampling
 
-    particle_set_t1 = np.zeros((n_samples, dim), dtype="float64")   # next iteration of particles
+    # the resampling step:
+    # indices = resampling.residual_resample(weights)
+    indices = resampling.stratified_resample(weights, rng=rng)
 
+    # new particle set is particles at index locations
+    particle_set_t1 = resampling.resample_from_index(pred_state, indices)
 
-    # this loop calculates \bar{X_t}, i.e. the predicted belief.
-    for n in range(n_samples):
-        # predicted motion step:
-        xn_t1 = sample_motion_model(particle_set_t[n])              # 3x1 vector: hypothetical state
+    return particle_set_t1, None
 
-        # measurement correction step:
-        weight_xn_t1 = state_likelihood(measurement_t, xn_t1)       # scalar value
 
-        pred_state[n] = xn_t1
-        weights[n] = weight_xn_t1
+class ParticleFilter:
+    """
+    Stateful version of particle_filter() for running the filter over a stream of measurements.
 
-    
-    # It was observed that if all weights are 0, the resampling step breaks. 
-    # Thus, adding a uniform distribution. This is obviously a very bad idea \ 
-    # as the true state can easily be discarded in the resampling step: TODO!
-    if np.sum(weights) > 0.0:
-        weights = weights/np.sum(weights)                       # normalize array only when sum in not 0
-    else:
-        print("possile divergence!")
-        weights[:] = 1 / n_samples                              # if sum is 0 then assign uniform distribution throughout
+    The filter holds its model matrices, its own random number generator and every array it needs
+    for a time step, so step() does not allocate new particle or weight arrays. The particles live
+    in two ping-pong buffers: the prediction of one step is written into the buffer that is not
+    current, and resampling gathers back into the other one.
 
+    Several filters can be run in the same process as they share no global state.
+    """
 
-    # the resampling step:
-    # indices = monte_carlo.residual_resample(weights)
-    indices = monte_carlo.stratified_resample(weights)
-    count += 1
-    print(count)
+    def __init__(self, n_samples=10000, init_low=-3, init_high=3, ess_fraction=resample_fraction,
+                 resampler=resampling.stratified_resample, seed=None, capacity=None):
+        """
+        Parameters:
+        n_samples: number of particles N
+        init_low, init_high: interval [init_low, init_high) the initial particles are uniformly drawn from
+        ess_fraction: resample only when the effective sample size drops below ess_fraction * N
+        resampler: one of the functions from resampling.py
+        seed: seed, SeedSequence or Generator for the filter's own numpy Generator. Filters that
+              run side by side should get independent streams, e.g. from SeedSequence.spawn()
+        capacity: largest number of particles the buffers can hold, for subclasses that change N.
+                  Defaults to n_samples
+        """
+        self.capacity = n_samples if capacity is None else max(capacity, n_samples)
+        self.dim = Ad.shape[0]
+        self.init_low, self.init_high = init_low, init_high
+        self.ess_fraction = ess_fraction
+        self.resampler = resampler
+        self.rng = np.random.default_rng(seed)
+
+        # the model
+        self.Ad_T = Ad.T.copy()                         # transposed, as particles are stored as rows
+        self.Qd_chol_T = Qd_chol.T.copy()
+        self.C_T = C.T.copy()
+        self.Rd_inv = Rd_inv
+        self.Rd_log_norm = Rd_log_norm
+
+        # preallocated buffers, of which the first N rows are in use
+        capacity = self.capacity
+        self._particles = np.empty((2, capacity, self.dim))      # ping-pong particle buffers
+        self._current = 0                                       # which of the two buffers holds the particle set
+        self._noise = np.empty((capacity, self.dim))            # standard normal draws
+        self._motion_noise = np.empty((capacity, self.dim))     # the same draws coloured by Qd
+        self._innovation = np.empty((capacity, C.shape[0]))     # z_t - C x for every particle
+        self._scaled_innovation = np.empty((capacity, C.shape[0]))  # the same times Rd^-1
+        self._log_weights = np.empty(capacity)
+        self._weights = np.empty(capacity)
+        self._posterior_weights = np.empty(capacity)           # the weights before the last resampling
+        self._indices = np.empty(capacity, dtype=np.intp)
+
+        self._resize(n_samples)
+        self.reset()
+
+    @property
+    def particles(self):
+        """(N, 3) view of the current particle set."""
+        return self._particles[self._current, :self.n_samples]
+
+    def _resize(self, n_samples):
+        """Sets the number of particles N in use, and the log_weights and weights views of length N."""
+        self.n_samples = n_samples
+        self.log_weights = self._log_weights[:n_samples]
+        self.weights = self._weights[:n_samples]
+
+    def reset(self, particles=None):
+        """
+        Reinitialises the filter with uniform weights.
+
+        Parameters:
+        particles: optional (N, 3) array of initial particles, N up to the capacity. If not given,
+                   the N particles are drawn uniformly from [init_low, init_high)
+        """
+        if particles is not None:
+            self._resize(len(particles))
+        current = self.particles
+        if particles is None:
+            self.rng.random(out=current)
+            current *= self.init_high - self.init_low
+            current += self.init_low
+        else:
+            current[:] = particles
+        self.log_weights.fill(-np.log(self.n_samples))
+        self.weights.fill(1 / self.n_samples)
+        self.steps = 0
+        self.resample_count = 0
+        self._posterior_n = 0                           # > 0 while the last step resampled, see posterior()
+
+    @property
+    def posterior(self):
+        """
+        (particles, weights) of the weighted belief after the last measurement update. If the last
+        step resampled, these are the weighted predictions from before resampling, which are still in
+        the other particle buffer: the resampled set has uniform weights and no ESS or MAP to speak of.
+        """
+        if self._posterior_n == 0:
+            return self.particles, self.weights
+        return self._particles[1 - self._current, :self._posterior_n], self._posterior_weights[:self._posterior_n]
+
+    def step(self, measurement_t):
+        """
+        Runs one predict, weight and (if needed) resample cycle of the filter in place.
+
+        Parameters:
+        measurement_t: Array of the measurements [z_theta, z_dtheta]
+
+        Returns True if the particles were resampled in this step.
+        """
+        pred_state = self._predict()
+        innovation = self._innovation[:self.n_samples]
+        scaled_innovation = self._scaled_innovation[:self.n_samples]
+
+        # measurement correction step, in the log domain: log w_t1 = log w_t + log p(z_t | x_t1)
+        np.matmul(pred_state, self.C_T, out=innovation)
+        for k in range(innovation.shape[1]):            # C x - z_t, the sign cancels in the quadratic form.
+            innovation[:, k] -= measurement_t[k]        # Column by column, as a broadcast is buffered
+        np.matmul(innovation, self.Rd_inv, out=scaled_innovation)
+        log_likelihood = np.einsum("ij,ij->i", scaled_innovation, innovation,
+                                   out=self.weights)           # weights buffer as scratch space
+        np.multiply(log_likelihood, -0.5, out=log_likelihood)
+        self.log_weights += log_likelihood
+        self.log_weights += self.Rd_log_norm
+        self._normalize()
+
+        self._current = 1 - self._current               # the prediction is now the current set
+        self.steps += 1
+        self._posterior_n = 0
+
+        if 1.0 / np.dot(self.weights, self.weights) >= self.ess_fraction * self.n_samples:
+            return False
+
+        self._posterior_n = self.n_samples
+        np.copyto(self._posterior_weights[:self.n_samples], self.weights)
+        self._resample()
+        self.log_weights.fill(-np.log(self.n_samples))
+        self.weights.fill(1 / self.n_samples)
+        self.resample_count += 1
+        return True
+
+    def _predict(self):
+        """Predicted motion step x_t1 = Ad x_t + N(0, Qd) of the current particles, written into the other buffer."""
+        n = self.n_samples
+        pred_state = self._particles[1 - self._current, :n]
+        np.matmul(self.particles, self.Ad_T, out=pred_state)
+        self.rng.standard_normal(out=self._noise[:n])
+        np.matmul(self._noise[:n], self.Qd_chol_T, out=self._motion_noise[:n])
+        pred_state += self._motion_noise[:n]
+        return pred_state
+
+    def _resample(self):
+        """The resampling step: gathers the chosen particles back into the other buffer."""
+        indices = self._indices[:self.n_samples]
+        self.resampler(self.weights, out=indices, rng=self.rng)
+        np.take(self.particles, indices, axis=0, out=self._particles[1 - self._current, :self.n_samples])
+        self._current = 1 - self._current
+
+    def estimate(self):
+        """Returns the weighted mean of the particle set, i.e. the state estimate [dtheta, theta, bias]."""
+        return self.weights @ self.particles
+
+    def _normalize(self):
+        """In-place log-sum-exp normalization of the weights. See normalize_log_weights()."""
+        max_log_weight = np.max(self.log_weights)
+        if not np.isfinite(max_log_weight):
+            self.log_weights.fill(-np.log(self.n_samples))      # no particle is plausible: start over uniformly
+            self.weights.fill(1 / self.n_samples)
+            return
+
+        np.subtract(self.log_weights, max_log_weight, out=self.weights)
+        np.exp(self.weights, out=self.weights)
+        weight_sum = np.sum(self.weights)
+        self.log_weights -= max_log_weight + np.log(weight_sum)
+        self.weights /= weight_sum
+
+
+def weighted_summary(particles, weights):
+    """
+    Compact summary of a weighted particle set, computed with one pass over the weighted particles.
 
-    # new particle set is particles at index locations
-    for i, index in enumerate(indices):
-        particle_set_t1[i] = pred_state[index]
+    Parameters:
+    particles: (N, 3) array of particles
+    weights: (N,) array of normalized weights
+
+    Returns a dict with:
+    mean: weighted mean of the particles, i.e. the state estimate [dtheta, theta, bias]
+    covariance: 3x3 weighted covariance of the particles
+    map: the particle with the largest weight
+    ess: effective sample size 1 / sum(w^2) of the weights
+    """
+    weighted = weights[:, np.newaxis] * particles
+    mean = np.sum(weighted, axis=0)
+    covariance = weighted.T @ particles - np.outer(mean, mean)      # E[x x^T] - E[x] E[x]^T
+    return {"mean": mean,
+            "covariance": covariance,
+            "map": particles[np.argmax(weights)].copy(),
+            "ess": 1.0 / np.dot(weights, weights)}
 
-    return particle_set_t1
 
+def run_filter(pf, measurements, recorder=None):
+    """
+    Streams measurements through a filter and yields a summary of the belief after every step,
+    so the filter output can be consumed online without keeping any particle sets around.
 
-def particle_animator(data, scat):
-    a, b = data
-    scat.set_offsets()
+    The summary and the recorded set are the weighted belief after the measurement update, i.e.
+    from before resampling when the filter provides it as pf.posterior.
 
-    # create the figure to plot the data to
+    Parameters:
+    pf: a ParticleFilter, or any filter with step(), particles and weights, and optionally posterior
+    measurements: iterable of measurement vectors [z_theta, z_dtheta]
+    recorder: optional particle_store.ParticleRecorder that gets the particle set of every step
 
-    fig, ax = plt.subplots()
-    ax.set(xlim=(-3, 6), ylim=(-3, 8))
-    scat = ax.scatter(np.linspace(0, 1, 10), np.linspace(2, 3, 10), s=6)
-    ani = FuncAnimation(fig=fig, 
-                        func=particle_animator, 
-                        # frames=generator, 
-                        fargs=(ax, scat), 
-                        interval=1000)
+    Yields the dict returned by weighted_summary() for every time step.
+    """
+    for measurement_t in measurements:
+        pf.step(measurement_t)
+        particles, weights = pf.posterior if hasattr(pf, "posterior") else (pf.particles, pf.weights)
+        if recorder is not None:
+            recorder.record(particles, weights)
+        yield weighted_summary(particles, weights)
 
-    plt.show()
 
+def main(record_dir=None, seed=None):
+    """
+    Runs the filter over kf_data_validation.csv.
 
-def main():
+    Parameters:
+    record_dir: optional directory to record the particle sets to, e.g. for visualizePF_live
+    seed: seed of the filter's random number generator, for reproducible runs
+    """
     a, b = -3, 3                                                # interval to generate uniform particles
     n_samples = 10000                                           # number of samples
-    dim = 3                                                         # vector dimension for 3 states to be estimated
-    particle_set = sm.uniform_samples(a, b, n_samples, dim)         # initialising particles to span the limits of state
+    pf = ParticleFilter(n_samples, a, b, seed=seed)                        # initialising particles to span the limits of state
 
     # Actual data taken from the csv
     z_theta, z_dtheta = sm.retreive_data(0)                     # measurements; unit rad, rad/sec
     theta_true, dtheta_true = sm.retreive_data(1)               # validation;   unit rad, rad/sec
-    time = len(z_theta)                                         # total number of measurements that we have
-
-    max_t, min_t = 0, 0
-    max_d, min_d = 0, 0
-
-    for t in range(time):
-        z_t = np.array([z_theta[t], z_dtheta[t]])
-        particle_set = particle_filter(particle_set, z_t)
-        theta_est = particle_set[:, 1]
-        dtheta_est = particle_set[:, 0]
-        if np.amax(theta_est) > max_t:
-            max_t = np.amax(theta_est)
-        if np.amax(dtheta_est) > max_d:
-            max_d = np.amax(dtheta_est)
-        if np.amin(theta_est) < min_t:
-            min_t = np.amin(theta_est)
-        if np.amin(dtheta_est) < min_d:
-            min_d = np.amin(dtheta_est)
-    
-    print(min_t, max_t)
-    print(min_d, max_d)
+    measurements = np.c_[z_theta, z_dtheta]                     # one [z_theta, z_dtheta] row per time step
+
+    recorder = None
+    if record_dir is not None:
+        recorder = particle_store.ParticleRecorder(record_dir, len(measurements), n_samples)
+
+    estimates = np.array([summary["mean"] for summary in run_filter(pf, measurements, recorder)])
+    if recorder is not None:
+        recorder.close()
+    theta_est = estimates[:, 1] + (np.pi / 2)                   # same offset as used in visualizePF_live
+    dtheta_est = estimates[:, 0]
+
+    print("RMSE theta: ", np.sqrt(np.mean((theta_est - theta_true) ** 2)))
+    print("RMSE dtheta:", np.sqrt(np.mean((dtheta_est - dtheta_true) ** 2)))
 
 
 if __name__ == "__main__":
     # TODO: 1. Move weighting process before prediction to go ahead with first un-intialized particles
-    # TODO: 2. Make weight and state matrices and then edit them only rather than appending to a new one.
     main()
@@ -0,0 +1,101 @@
+"""
+Binary store for particle trajectories, i.e. the particle set (and weights) of every time step of a run.
+
+A store is a directory with three .npy files that are preallocated once and memory-mapped:
+    particles.npy:  (T, N, dim) float64, the particle set of every time step
+    weights.npy:    (T, N) float64, the normalized weights of every time step (optional)
+    counts.npy:     (T,) int64 index, number of particles recorded at every step. 0 for steps
+                    that have not been recorded yet, and smaller than N if a filter changes its
+                    number of particles over time.
+
+ParticleRecorder writes a store while the filter runs, and ParticleTrajectory replays any time
+step of it as a zero-copy view of the memory map.
+"""
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class ParticleRecorder:
+    """Appends the particle set of every time step to a preallocated memory-mapped store."""
+
+    def __init__(self, directory, n_steps, n_particles, dim=3, record_weights=True):
+        """
+        Parameters:
+        directory: directory of the store. Created if it does not exist, existing files are overwritten
+        n_steps: number of time steps T to make room for
+        n_particles: largest number of particles N per time step
+        dim: dimension of a particle
+        record_weights: whether to also store the weights
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.particles = open_memmap(os.path.join(directory, "particles.npy"), mode="w+",
+                                     dtype=np.float64, shape=(n_steps, n_particles, dim))
+        self.weights = None
+        weights_file = os.path.join(directory, "weights.npy")
+        if record_weights:
+            self.weights = open_memmap(weights_file, mode="w+", dtype=np.float64, shape=(n_steps, n_particles))
+        elif os.path.exists(weights_file):
+            os.remove(weights_file)                     # weights of an earlier run would be read back as this one's
+        self.counts = open_memmap(os.path.join(directory, "counts.npy"), mode="w+",
+                                  dtype=np.int64, shape=(n_steps,))
+        self.t = 0                                      # next time step to write
+
+    def record(self, particles, weights=None):
+        """
+        Writes the particle set (and its weights) of the next time step.
+
+        Parameters:
+        particles: (n, dim) array of particles, n <= N
+        weights: (n,) array of normalized weights. Ignored if the store does not record weights
+        """
+        if self.t >= len(self.counts):
+            raise IndexError("The store is full: all " + str(len(self.counts)) + " time steps are recorded.")
+        n = len(particles)
+        self.particles[self.t, :n] = particles
+        if self.weights is not None and weights is not None:
+            self.weights[self.t, :n] = weights
+        self.counts[self.t] = n
+        self.t += 1
+
+    def close(self):
+        """Flushes the memory maps to disk."""
+        for array in (self.particles, self.weights, self.counts):
+            if array is not None:
+                array.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParticleTrajectory:
+    """Read-only, memory-mapped view of a store written by ParticleRecorder."""
+
+    def __init__(self, directory):
+        """
+        Parameters:
+        directory: directory of the store
+        """
+        self.directory = directory
+        self._particles = np.load(os.path.join(directory, "particles.npy"), mmap_mode="r")
+        self.counts = np.load(os.path.join(directory, "counts.npy"), mmap_mode="r")
+        weights_file = os.path.join(directory, "weights.npy")
+        self._weights = np.load(weights_file, mmap_mode="r") if os.path.exists(weights_file) else None
+
+    def __len__(self):
+        """Number of time steps that have been recorded."""
+        return int(np.count_nonzero(self.counts))
+
+    def particles(self, t):
+        """(n, dim) view of the particle set at time step t."""
+        return self._particles[t, :self.counts[t]]
+
+    def weights(self, t):
+        """(n,) view of the weights at time step t, or uniform weights if the store has none."""
+        if self._weights is None:
+            return np.full(self.counts[t], 1 / self.counts[t])
+        return self._weights[t, :self.counts[t]]
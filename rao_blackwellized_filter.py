@@ -0,0 +1,164 @@
+"""
+Rao-Blackwellized particle filter for the tilt/bias model of particle_filter.py.
+
+The angular rate dtheta and the gyro bias enter the model linearly, so they do not have to be
+sampled: every particle only samples the tilt angle theta, and carries a Kalman filter for
+[dtheta, bias] conditioned on its own theta trajectory. Splitting the state into
+x^n = theta (sampled) and x^l = [dtheta, bias] (marginalized), the model reads
+
+    x^n_t1 = x^n_t + A_n x^l_t + w^n          A_n = [T, 0]
+    x^l_t1 = x^l_t + w^l
+    z_t    = C_n x^n_t + C_l x^l_t + v        C_n = [1, 0]^T,  C_l = [[0, 0], [1, 1]]
+
+with [w^l, w^n] ~ N(0, Qd) and v ~ N(0, Rd). This is the mixed linear/nonlinear filter of
+Schon, Gustafsson and Nordlund, "Marginalized Particle Filters for Mixed Linear/Nonlinear
+State-Space Models", 2005. As A_n, C_l and the noise covariances are the same for every particle,
+the Kalman covariance is too: the particles only differ in their Kalman means, and all their
+Kalman updates are done at once on an (N, 2) array.
+"""
+import numpy as np
+import particle_filter as pf                            # the tilt/bias model
+import resampling
+import samples_and_measurements as sm
+
+# the model, split into the sampled theta (n) and the marginalized [dtheta, bias] (l)
+linear = [0, 2]                                         # indices of dtheta and bias in the full state
+nonlinear = 1                                           # index of theta
+A_n = pf.Ad[nonlinear, linear][np.newaxis, :]           # 1x2: theta_t1 = theta_t + T dtheta_t
+A_l = pf.Ad[np.ix_(linear, linear)]                     # 2x2: identity
+C_n = pf.C[:, nonlinear]                                # (2,): z_theta = theta
+C_l = pf.C[:, linear]                                   # 2x2: z_dtheta = dtheta + bias
+Q_l = pf.Qd[np.ix_(linear, linear)]
+Q_n = pf.Qd[nonlinear, nonlinear]
+Q_ln = pf.Qd[linear, nonlinear][:, np.newaxis]          # 2x1: cov(w^l, w^n)
+
+# w^l decorrelated from w^n, used in the Kalman time update
+A_l_bar = A_l - Q_ln @ A_n / Q_n
+Q_l_bar = Q_l - Q_ln @ Q_ln.T / Q_n
+
+
+class RaoBlackwellizedParticleFilter:
+    """
+    Rao-Blackwellized version of particle_filter.ParticleFilter with the same step(), estimate()
+    and reset() interface. Needs one to two orders of magnitude fewer particles for the same accuracy.
+    """
+
+    def __init__(self, n_samples=100, init_low=-3, init_high=3, init_var=3.0,
+                 ess_fraction=pf.resample_fraction, resampler=resampling.stratified_resample, seed=None):
+        """
+        Parameters:
+        n_samples: number of particles N
+        init_low, init_high: interval [init_low, init_high) the initial theta particles are uniformly drawn from
+        init_var: initial variance of dtheta and bias in the Kalman filters, with mean 0
+        ess_fraction: resample only when the effective sample size drops below ess_fraction * N
+        resampler: one of the functions from resampling.py
+        seed: seed, SeedSequence or Generator for the filter's own numpy Generator
+        """
+        self.n_samples = n_samples
+        self.init_low, self.init_high = init_low, init_high
+        self.init_var = init_var
+        self.ess_fraction = ess_fraction
+        self.resampler = resampler
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        """Reinitialises the filter with uniform weights."""
+        self.theta = self.rng.uniform(self.init_low, self.init_high, self.n_samples)   # sampled x^n
+        self.linear_means = np.zeros((self.n_samples, 2))                               # Kalman means of x^l
+        self.linear_cov = self.init_var * np.identity(2)                                # shared Kalman covariance
+        self.log_weights = np.full(self.n_samples, -np.log(self.n_samples))
+        self.weights = np.full(self.n_samples, 1 / self.n_samples)
+        self.steps = 0
+        self.resample_count = 0
+        self._posterior = None
+
+    @property
+    def particles(self):
+        """(N, 3) particles [dtheta, theta, bias], with the Kalman means for dtheta and bias."""
+        particles = np.empty((self.n_samples, 3))
+        particles[:, nonlinear] = self.theta
+        particles[:, linear] = self.linear_means
+        return particles
+
+    @property
+    def posterior(self):
+        """(particles, weights) after the last measurement update, from before resampling if the last step resampled."""
+        if self._posterior is None:
+            return self.particles, self.weights
+        return self._posterior
+
+    def step(self, measurement_t):
+        """
+        Runs one predict, weight, (if needed) resample and Kalman update cycle of the filter.
+
+        Parameters:
+        measurement_t: Array of the measurements [z_theta, z_dtheta]
+
+        Returns True if the particles were resampled in this step.
+        """
+        P = self.linear_cov
+
+        # particle time update: theta_t1 ~ N(theta_t + A_n x^l, A_n P A_n^T + Q_n)
+        N = (A_n @ P @ A_n.T)[0, 0] + Q_n
+        theta_prev = self.theta
+        self.theta = theta_prev + self.linear_means @ A_n[0] + np.sqrt(N) * self.rng.standard_normal(self.n_samples)
+
+        # Kalman time update, using theta_t1 - theta_t as a measurement of A_n x^l + w^n
+        L = A_l_bar @ P @ A_n.T / N                     # 2x1
+        theta_step = (self.theta - theta_prev)[:, np.newaxis]
+        self.linear_means = (self.linear_means @ A_l_bar.T + theta_step @ (Q_ln / Q_n).T
+                             + (theta_step - self.linear_means @ A_n.T) @ L.T)
+        P = A_l_bar @ P @ A_l_bar.T + Q_l_bar - N * (L @ L.T)
+
+        # weights from the marginal likelihood N(z; C_n theta + C_l x^l, C_l P C_l^T + Rd)
+        S = C_l @ P @ C_l.T + pf.Rd
+        S_inv = np.linalg.inv(S)
+        innovation = measurement_t - np.outer(self.theta, C_n) - self.linear_means @ C_l.T   # (N, 2)
+        mahalanobis = np.einsum("ij,ij->i", innovation @ S_inv, innovation)
+        log_norm = -np.log(2 * np.pi) - 0.5 * np.log(np.linalg.det(S))
+        try:
+            self.log_weights, self.weights = pf.normalize_log_weights(self.log_weights + log_norm - 0.5 * mahalanobis)
+        except ValueError:
+            self.log_weights = np.full(self.n_samples, -np.log(self.n_samples))   # no particle is plausible
+            self.weights = np.full(self.n_samples, 1 / self.n_samples)
+
+        # Kalman measurement update of every particle, with the shared gain
+        K = P @ C_l.T @ S_inv                           # 2x2
+        self.linear_means = self.linear_means + innovation @ K.T
+        self.linear_cov = P - K @ S @ K.T
+        self.steps += 1
+        self._posterior = None
+
+        if resampling.effective_sample_size(self.weights) >= self.ess_fraction * self.n_samples:
+            return False
+
+        self._posterior = (self.particles, self.weights)
+        indices = self.resampler(self.weights, rng=self.rng)
+        self.theta = self.theta[indices]
+        self.linear_means = self.linear_means[indices]
+        self.log_weights = np.full(self.n_samples, -np.log(self.n_samples))
+        self.weights = np.full(self.n_samples, 1 / self.n_samples)
+        self.resample_count += 1
+        return True
+
+    def estimate(self):
+        """Returns the weighted mean of the particles, i.e. the state estimate [dtheta, theta, bias]."""
+        return self.weights @ self.particles
+
+
+def main():
+    z_theta, z_dtheta = sm.retreive_data(0)                     # measurements; unit rad, rad/sec
+    theta_true, dtheta_true = sm.retreive_data(1)               # validation;   unit rad, rad/sec
+    measurements = np.c_[z_theta, z_dtheta]
+
+    for name, filter_ in (("PF, N = 10000", pf.ParticleFilter(10000, seed=0)),
+                          ("RBPF, N = 100", RaoBlackwellizedParticleFilter(100, seed=0))):
+        estimates = np.array([summary["mean"] for summary in pf.run_filter(filter_, measurements)])
+        theta_est = estimates[:, 1] + (np.pi / 2)               # same offset as used in visualizePF_live
+        print(name.ljust(14), "RMSE theta:", np.sqrt(np.mean((theta_est - theta_true) ** 2)),
+              " RMSE dtheta:", np.sqrt(np.mean((estimates[:, 0] - dtheta_true) ** 2)))
+
+
+if __name__ == "__main__":
+    main()
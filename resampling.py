@@ -0,0 +1,189 @@
+"""
+Vectorized resampling schemes for the particle filter.
+
+Every resampler takes an array of normalized weights and returns the indices of the
+particles that survive. The indices are found with a single np.searchsorted on the
+cumulative sum of the weights, and can be written into a preallocated integer buffer
+through the 'out' argument so that no new array is allocated per time step.
+
+The schemes follow Chapter 4 of Probabilistic Robotics and the implementations in filterpy.
+"""
+import numpy as np
+
+
+def _cumulative_sum(weights):
+    """Cumulative sum of the weights with the last entry forced to 1 to guard against round-off."""
+    cumulative_sum = np.cumsum(weights)
+    cumulative_sum[-1] = 1.0
+    return cumulative_sum
+
+
+def _random_state(rng):
+    """The global np.random state unless a Generator is given."""
+    return np.random if rng is None else rng
+
+
+def _search(cumulative_sum, positions, out):
+    """Indices of 'positions' in 'cumulative_sum', written into 'out' when it is given."""
+    indices = np.searchsorted(cumulative_sum, positions)
+    if out is None:
+        return indices
+    out[:] = indices
+    return out
+
+
+def _search_unsorted(cumulative_sum, positions, out):
+    """
+    _search() for positions in random order. np.searchsorted is several times faster on sorted
+    positions, so the positions are searched in sorted order and the indices scattered back.
+    """
+    order = np.argsort(positions)
+    indices = np.empty(len(positions), dtype=np.intp) if out is None else out
+    indices[order] = np.searchsorted(cumulative_sum, positions[order])
+    return indices
+
+
+def effective_sample_size(weights):
+    """
+    Returns the effective sample size 1 / sum(w^2) of the normalized weights.
+    It is N for uniform weights and 1 when a single particle carries all the weight.
+    """
+    return 1.0 / np.dot(weights, weights)
+
+
+def multinomial_resample(weights, out=None, rng=None):
+    """
+    Draws N independent indices, each with probability equal to its weight.
+    This has the highest variance of all the schemes here.
+
+    Parameters:
+    weights: (N,) array of normalized weights
+    out: optional (N,) integer array to write the indices into
+    rng: optional numpy Generator to draw the positions from. Defaults to the global np.random state
+
+    Returns: (N,) array of resampled indices
+    """
+    n = len(weights)
+    positions = _random_state(rng).random(n)
+    return _search_unsorted(_cumulative_sum(weights), positions, out)
+
+
+def stratified_resample(weights, out=None, rng=None):
+    """
+    Splits [0, 1) into N equal strata and draws one uniform position inside each of them.
+
+    Parameters:
+    weights: (N,) array of normalized weights
+    out: optional (N,) integer array to write the indices into
+    rng: optional numpy Generator to draw the positions from. Defaults to the global np.random state
+
+    Returns: (N,) array of resampled indices
+    """
+    n = len(weights)
+    positions = (_random_state(rng).random(n) + np.arange(n)) / n
+    return _search(_cumulative_sum(weights), positions, out)
+
+
+def systematic_resample(weights, out=None, rng=None):
+    """
+    Like stratified_resample, but with a single random offset shared by all the strata.
+    Also known as low variance sampling.
+
+    Parameters:
+    weights: (N,) array of normalized weights
+    out: optional (N,) integer array to write the indices into
+    rng: optional numpy Generator to draw the positions from. Defaults to the global np.random state
+
+    Returns: (N,) array of resampled indices
+    """
+    n = len(weights)
+    positions = (_random_state(rng).random() + np.arange(n)) / n
+    return _search(_cumulative_sum(weights), positions, out)
+
+
+def residual_resample(weights, out=None, rng=None):
+    """
+    Deterministically keeps floor(N * w) copies of every particle and fills the remaining
+    slots by multinomial resampling on the residual weights.
+
+    Parameters:
+    weights: (N,) array of normalized weights
+    out: optional (N,) integer array to write the indices into
+    rng: optional numpy Generator to draw the positions from. Defaults to the global np.random state
+
+    Returns: (N,) array of resampled indices
+    """
+    n = len(weights)
+    indices = np.empty(n, dtype=np.intp) if out is None else out
+
+    num_copies = np.floor(n * np.asarray(weights)).astype(np.intp)
+    k = np.sum(num_copies)
+    indices[:k] = np.repeat(np.arange(n), num_copies)       # the deterministic copies
+
+    residual = n * np.asarray(weights) - num_copies         # what is left of each weight
+    if k < n:
+        residual /= np.sum(residual)
+        positions = _random_state(rng).random(n - k)
+        _search_unsorted(_cumulative_sum(residual), positions, indices[k:])
+    return indices
+
+
+def _batch_search(weights, positions):
+    """
+    Row-wise np.searchsorted of 'positions' in the cumulative sum of every row of 'weights'.
+    Row b of the cumulative sums is shifted by b, so all B rows form one sorted array and a single
+    np.searchsorted call handles the whole batch.
+    """
+    n_batch, n = weights.shape
+    offsets = np.arange(n_batch)[:, np.newaxis]
+    cumulative_sum = np.cumsum(weights, axis=1)
+    cumulative_sum[:, -1] = 1.0
+    cumulative_sum += offsets
+    indices = np.searchsorted(cumulative_sum.ravel(), (positions + offsets).ravel())
+    indices = indices.reshape(n_batch, n) - offsets * n
+    return np.minimum(indices, n - 1, out=indices)          # a position of exactly b + 1 belongs to row b
+
+
+def batch_stratified_resample(weights, rng=None):
+    """
+    stratified_resample applied independently to every row of a (B, N) array of weights.
+
+    Parameters:
+    weights: (B, N) array, every row holds the normalized weights of one filter
+    rng: optional numpy Generator to draw the positions from. Defaults to the global np.random state
+
+    Returns: (B, N) array of resampled indices into each row
+    """
+    n_batch, n = weights.shape
+    positions = (_random_state(rng).random((n_batch, n)) + np.arange(n)) / n
+    return _batch_search(weights, positions)
+
+
+def batch_systematic_resample(weights, rng=None):
+    """
+    systematic_resample applied independently to every row of a (B, N) array of weights,
+    with one random offset per row.
+
+    Parameters:
+    weights: (B, N) array, every row holds the normalized weights of one filter
+    rng: optional numpy Generator to draw the positions from. Defaults to the global np.random state
+
+    Returns: (B, N) array of resampled indices into each row
+    """
+    n_batch, n = weights.shape
+    positions = (_random_state(rng).random((n_batch, 1)) + np.arange(n)) / n
+    return _batch_search(weights, positions)
+
+
+def resample_from_index(particles, indices, out=None):
+    """
+    Gathers the resampled particles with a single fancy-indexing copy.
+
+    Parameters:
+    particles: (N, dim) array of particles
+    indices: (N,) array of indices returned by one of the resamplers
+    out: optional (N, dim) array, different from 'particles', to write the new set into
+
+    Returns: (N, dim) array of resampled particles
+    """
+    return np.take(particles, indices, axis=0, out=out)
@@ -1,3 +1,7 @@
+import os
+import glob
+import functools
+import tempfile
 import numpy as np
 import pandas as pd
 
@@ -5,16 +9,119 @@ import pandas as pd
 deg2rad = np.pi / 180
 rad2deg = 180 / np.pi
 
-def uniform_samples(a = -1, b = 1, n = 100, d = 2):
+def uniform_samples(a = -1, b = 1, n = 100, d = 2, rng = None):
     """
     Returns n d-dimensional samples that are uniformly distributed in the half \
     open interval [a, b)
+
+    rng: optional seed or numpy Generator to draw the samples from
     """
-    samples = (b - a) * np.random.random((n, d)) + a
+    rng = np.random.default_rng(rng)
+    samples = (b - a) * rng.random((n, d)) + a
     return samples
 
 
-def retreive_data(flag = 0):
+_measurement_columns = ["AccX (m/s^2)", "AccY (m/s^2)", "Gyro (deg/sec)"]
+_truth_columns = ["Gyro45(deg/sec)", "Theta (deg)"]                    # only in recordings with an encoder
+_columns = _measurement_columns + _truth_columns
+
+
+def _convert_measurements(input_df, out):
+    """Writes z_theta and z_dtheta of a block of csv rows into the (2, n) array out."""
+    accX = input_df["AccX (m/s^2)"].to_numpy(dtype=np.float64)
+    accY = input_df["AccY (m/s^2)"].to_numpy(dtype=np.float64)
+    out[0] = np.arctan2(-accY, accX)                                    # y_theta = -ay/ax. output in radians
+    out[1] = input_df["Gyro (deg/sec)"].to_numpy() * deg2rad            # convert to rad/sec as input in deg/sec
+    return out
+
+
+def _convert_truth(input_df, out):
+    """Writes theta_true and dtheta_true of a block of csv rows into the (2, n) array out."""
+    out[0] = input_df["Theta (deg)"].to_numpy() * deg2rad               # true value of theta
+    out[1] = input_df["Gyro45(deg/sec)"].to_numpy() * deg2rad           # true value of dtheta
+    return out
+
+
+def _convert_block(input_df):
+    """
+    Converts a block of csv rows into a (4, n) array with the rows z_theta, z_dtheta, theta_true
+    and dtheta_true, all in radians and radians/sec. See retreive_data() for what they are.
+    """
+    data = np.empty((4, len(input_df)))
+    _convert_measurements(input_df, data[:2])
+    _convert_truth(input_df, data[2:])
+    return data
+
+
+def _csv_to_arrays(path):
+    """Parses the whole csv once into the (4, T) array described in _convert_block()."""
+    data = _convert_block(pd.read_csv(path, usecols=_columns))
+    data.setflags(write=False)
+    return data
+
+
+def _write_cache(path, cache_file, data):
+    """
+    Saves data as the binary cache file of the csv at path and removes the caches of older versions
+    of the csv. The cache is best-effort: if the directory is not writable, nothing is saved.
+    """
+    try:
+        for stale_file in glob.glob(glob.escape(path) + ".*.cache.npy"):
+            if stale_file != cache_file:
+                try:
+                    os.remove(stale_file)
+                except FileNotFoundError:               # already removed by another process
+                    pass
+
+        # write to a temporary file next to the csv and rename it, so another process never maps a partial file
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=8)
+def _load_dataset(path, mtime_ns, cache):
+    """Memoized body of load_dataset(). The file's mtime is part of the key, so edits invalidate it."""
+    if not cache:
+        return _csv_to_arrays(path)
+
+    cache_file = path + "." + str(mtime_ns) + ".cache.npy"
+    if os.path.exists(cache_file):
+        return np.load(cache_file, mmap_mode="r")
+
+    data = _csv_to_arrays(path)
+    _write_cache(path, cache_file, data)
+    return data
+
+
+def load_dataset(path="kf_data_validation.csv", cache=False):
+    """
+    Loads the measurements and the ground truth from the csv with a single parse.
+
+    The result is memoized for the lifetime of the process. With cache=True it is also saved next to
+    the csv as a binary <path>.<mtime>.cache.npy file, if the directory is writable, and later runs
+    then only memory-map that file, until the csv is modified.
+
+    Parameters:
+    path: path to the csv
+    cache: whether to read and write the binary cache file
+
+    Returns:
+    z_theta, z_dtheta, theta_true, dtheta_true as read-only arrays. See retreive_data()
+    """
+    path = os.path.abspath(path)
+    z_theta, z_dtheta, theta_true, dtheta_true = _load_dataset(path, os.stat(path).st_mtime_ns, cache)
+    return z_theta, z_dtheta, theta_true, dtheta_true
+
+
+def retreive_data(flag = 0, path = "kf_data_validation.csv", cache = False):
     """
     Function to return measured data and ground truth values from a csv
     The header of the csv looks like this:
@@ -27,6 +134,8 @@ def retreive_data(flag = 0):
 
     Parameters:
     flag: what to return: measurement data(0) or ground truth(1)
+    path: path to the csv. The data is loaded through load_dataset(), so repeated calls do not reparse it
+    cache: whether to read and write the binary cache file next to the csv, see load_dataset()
 
     Returns:
     z_theta and z_dtheta if flag = 0
@@ -39,27 +148,45 @@ def retreive_data(flag = 0):
     theta_true: true value of the tilt angle. unit in radians
     dtheta_true: true value of the angular velocity. unit in radians/sec
     """
-    input_df = pd.read_csv('kf_data_validation.csv')
-    # df_len = len(input_df)
+    z_theta, z_dtheta, theta_true, dtheta_true = load_dataset(path, cache)
 
     if flag == 0:
-        accX = np.array(input_df['AccX (m/s^2)'].tolist())      # converting into an array to \
-        accY = np.array(input_df['AccY (m/s^2)'].tolist())      # iterate over each element \
-        gyro = np.array(input_df['Gyro (deg/sec)'].tolist())    # to bring in form of measurement 'y'.
-        
-        z_theta = np.arctan2(-accY, accX)                       # y_theta = -ay/ax. output in radians
-        z_dtheta = gyro * deg2rad                               # convert to rad/sec as input in deg/sec
-
         return z_theta, z_dtheta
 
     elif flag == 1:
-        theta_true = np.array(input_df['Theta (deg)'].tolist())         # true value of theta to compare with estimated
-        dtheta_true = np.array(input_df['Gyro45(deg/sec)'].tolist())    # true value of dtheta to compare with estimated
-        
-        theta_true = theta_true * deg2rad                   # converting the unit to randians
-        dtheta_true = dtheta_true * deg2rad                 # converting the unit to randians/sec
-
         return theta_true, dtheta_true
     
     else:
-        raise ValueError("Value should either be 0 or 1.")
\ No newline at end of file
+        raise ValueError("Value should either be 0 or 1.")
+
+
+def read_chunks(path = "kf_data_validation.csv", chunk_size = 4096, flag = 0):
+    """
+    Reads the csv in blocks of chunk_size rows, so memory stays bounded however long the log is
+    and the first block is available as soon as it has been parsed. Only the columns needed for
+    flag are read, so flag = 0 also works on raw IMU recordings without the ground truth columns.
+
+    Parameters:
+    path: path to the csv
+    chunk_size: number of rows per block
+    flag: what to return: measurement data(0) or ground truth(1), as in retreive_data()
+
+    Yields:
+    (z_theta, z_dtheta) if flag = 0, (theta_true, dtheta_true) if flag = 1, as arrays of up to chunk_size values
+    """
+    if flag not in (0, 1):
+        raise ValueError("Value should either be 0 or 1.")
+
+    columns, convert = (_measurement_columns, _convert_measurements) if flag == 0 else (_truth_columns, _convert_truth)
+    for input_df in pd.read_csv(path, usecols=columns, chunksize=chunk_size):
+        first, second = convert(input_df, np.empty((2, len(input_df))))
+        yield first, second
+
+
+def stream_measurements(path = "kf_data_validation.csv", chunk_size = 4096, flag = 0):
+    """
+    Like read_chunks(), but yields one vector [z_theta, z_dtheta] (or [theta_true, dtheta_true]
+    for flag = 1) per row, e.g. to feed particle_filter.run_filter().
+    """
+    for first, second in read_chunks(path, chunk_size, flag):
+        yield from np.c_[first, second]
\ No newline at end of file
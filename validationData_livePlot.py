@@ -9,7 +9,8 @@ Also given in this offcial Matplotlib example: https://matplotlib.org/examples/a
 
 
 import numpy as np
-import pandas as pd
+from collections import deque
+import samples_and_measurements as sm
 import matplotlib
 matplotlib.use('tkagg') 
 import matplotlib.pyplot as plt
@@ -24,7 +25,7 @@ zero_mean = np.array([0.0, 0.0, 0.0])                   # to construct any N(0,
 # np.random.seed(0)                                       # ensures we get the same random results each time
 
 
-def csv_generator(flag):
+def csv_generator(flag, chunk_size=1024):
     """
     Generator function to yield a new theta and dtheta value at each iteration.
     Needed by the animation function to get a new value at each 'interval' seconds.
@@ -32,6 +33,7 @@ def csv_generator(flag):
     
     Parameters:
     flag: to return the measurements (0) or the true data (1). 
+    chunk_size: number of csv rows parsed and converted at once
 
     Yeilds a zip of:
     z_theta: tangent funtion of accelerometer data. unit in radians
@@ -40,31 +42,8 @@ def csv_generator(flag):
     theta_true: true value of the tilt angle. unit in radians
     dtheta_true: true value of the angular velocity. unit in radians/sec
     """
-    input_df = pd.read_csv('kf_data_validation.csv')
-
-    if flag == 0:
-        accX = np.array(input_df['AccX (m/s^2)'].tolist())      # converting into an array to \
-        accY = np.array(input_df['AccY (m/s^2)'].tolist())      # iterate over each element \
-        gyro = np.array(input_df['Gyro (deg/sec)'].tolist())    # to bring in form of measurement 'y'.
-        
-        z_theta = np.arctan2(-accY, accX)                       # y_theta = -ay/ax. output in radians
-        z_dtheta = gyro * deg2rad                               # convert to rad/sec as input in deg/sec
-
-        for z_t, z_dt in zip(z_theta, z_dtheta):
-            yield z_t, z_dt
-
-    elif flag == 1:
-        theta_true = np.array(input_df['Theta (deg)'].tolist())         # true value of theta to compare with estimated
-        dtheta_true = np.array(input_df['Gyro45(deg/sec)'].tolist())    # true value of dtheta to compare with estimated
-        
-        theta_true = theta_true * deg2rad                   # converting the unit to randians
-        dtheta_true = dtheta_true * deg2rad                 # converting the unit to randians/sec
-
-        for th, dth in zip(theta_true, dtheta_true):
-            yield th, dth
-
-    else:
-        raise ValueError("Value should either be 0 or 1.")
+    for first, second in sm.read_chunks('kf_data_validation.csv', chunk_size, flag):   # bounded memory for long logs
+        yield from zip(first, second)
 
 
 def animator(data, lines, axes):
@@ -116,7 +95,116 @@ def animator(data, lines, axes):
 
 
 
-def main():
+class SlidingExtrema:
+    """
+    Running min and max over the last 'window' values of a stream, with monotonic deques.
+    Each push costs amortized O(1), however long the window is.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.count = 0                                  # number of values pushed so far
+        self._min = deque()                             # (index, value), values increasing
+        self._max = deque()                             # (index, value), values decreasing
+
+    def push(self, value):
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._min.append((self.count, value))
+        self._max.append((self.count, value))
+        self.count += 1
+
+        oldest = self.count - self.window               # index of the first value still in the window
+        if self._min[0][0] < oldest:
+            self._min.popleft()
+        if self._max[0][0] < oldest:
+            self._max.popleft()
+
+    def min(self):
+        return self._min[0][1]
+
+    def max(self):
+        return self._max[0][1]
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer for the x, theta and dtheta values of the last 'capacity' samples.
+    Every sample is written twice, at i and i + capacity, so the window in time order is
+    always the contiguous slice [start, start + capacity) and never has to be copied.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros((3, 2 * capacity))         # rows: x, theta, dtheta
+        self.count = 0                                  # number of samples pushed so far
+        self.extrema = [SlidingExtrema(capacity), SlidingExtrema(capacity)]     # theta, dtheta
+
+    def push(self, theta_t, dtheta_t):
+        i = self.count % self.capacity
+        self.data[:, i] = self.data[:, i + self.capacity] = (self.count, theta_t, dtheta_t)
+        self.extrema[0].push(theta_t)
+        self.extrema[1].push(dtheta_t)
+        self.count += 1
+
+    def window(self):
+        """Views of x, theta and dtheta of the samples in the window, oldest first."""
+        n = min(self.count, self.capacity)
+        start = self.count % self.capacity if self.count > self.capacity else 0
+        return self.data[:, start:start + n]
+
+
+def decimated(frames, decimate):
+    """Groups the samples of the generator 'frames' into lists of 'decimate' samples, one list per rendered frame."""
+    batch = []
+    for sample in frames:
+        batch.append(sample)
+        if len(batch) == decimate:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ring_animator(data, lines, axes, buffer):
+    """
+    Animator for the ring-buffer mode: pushes a batch of samples and renders the sliding window once.
+    Unlike animator(), the cost of a frame depends only on the buffer capacity and not on how long
+    the stream has been running.
+
+    Parameters:
+    data: list of (theta, dtheta) samples from decimated()
+    lines: Array of Line2D objects to set the new data to.
+    axes: Array of axes, axes[0] for theta and axes[1] for dtheta.
+    buffer: the RingBuffer holding the plotted window
+
+    Returns:
+    lines: Modified array of Line2D objects
+    """
+    for theta_t, dtheta_t in data:
+        buffer.push(theta_t, dtheta_t)
+
+    xdata, yth_data, ydth_data = buffer.window()
+    lines[0].set_data(xdata, yth_data)
+    lines[1].set_data(xdata, ydth_data)
+
+    for ax, extrema in zip(axes, buffer.extrema):
+        ax.set_xlim(xdata[0], max(xdata[0] + buffer.capacity, xdata[-1]))
+        margin = 0.1 * (extrema.max() - extrema.min()) or 0.1
+        ax.set_ylim(extrema.min() - margin, extrema.max() + margin)
+
+    return lines
+
+
+def main(ring_capacity=None, decimate=1):
+    """
+    Parameters:
+    ring_capacity: if given, only the last ring_capacity samples are plotted as a sliding window
+                   with a constant cost per frame. If None, the whole history is plotted.
+    decimate: in the ring-buffer mode, number of samples consumed per rendered frame
+    """
     fig, axes = plt.subplots(2, 1)
 
     for ax in axes:
@@ -131,6 +219,17 @@ def main():
 
     fig.suptitle(r"Live PLot of $\theta$ and $\dot\theta$", fontsize=20)
     
+    if ring_capacity is not None:
+        ani = FuncAnimation(fig=fig,
+                            func=ring_animator,
+                            frames=decimated(csv_generator(0), decimate),
+                            fargs=(lines, axes, RingBuffer(ring_capacity)),
+                            blit=False,                 # the x limits slide every frame
+                            interval=10 * decimate)     # keeps up with the 100 Hz stream
+        plt.tight_layout()
+        plt.show()
+        return
+
     ani = FuncAnimation(fig=fig,                        # pass the figure to animate
                         func=animator,                  # function to update the figure each frame
                         frames=csv_generator(0),        # argument for function. generator object
@@ -1,40 +1,119 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import samples_and_measurements as sm
+import particle_store
 from matplotlib.animation import FuncAnimation
 
-directory = "./particle_dataset/particle_set_"
+directory = "./particle_dataset"                # written by particle_filter.main(record_dir=directory)
+theta_offset = np.pi / 2                        # added to the estimated theta to compare it with theta_true
+theta_range = (-3, 3)                           # range of theta shown in the plots
 
 
 def generator():
     # print(2, end="")
     theta_true, dtheta_true = sm.retreive_data(1)  # validation data; unit rad, rad/sec
-    for t in range(1000):
-        filename = directory + str(t)
-        particle_set = np.loadtxt(filename)
+    trajectory = particle_store.ParticleTrajectory(directory)
+    for t in range(len(trajectory)):
+        particle_set = trajectory.particles(t)     # zero-copy view into the memory map
         theta_est = particle_set[:, 1]
         dtheta_est = particle_set[:, 0]
 
-        yield t, theta_est, dtheta_est, theta_true[t], dtheta_true[t]
+        yield t, theta_est, dtheta_est, theta_true[t], dtheta_true[t], trajectory.weights(t)
 
 
 def animator(data, scat1, scat2):
     # print(1, end="")
-    t, theta, dtheta, theta_true, dtheta_true = data
+    t, theta, dtheta, theta_true, dtheta_true, weights = data
     pos = t * np.ones(len(theta))
     true = np.c_[t, theta_true]
 
-    estimate = np.c_[pos, theta + (np.pi / 2)]
+    estimate = np.c_[pos, theta + theta_offset]
     scat1.set_offsets(estimate)
     scat2.set_offsets(true)
 
 
-def main():
+def theta_histogram(theta, weights, bins=200):
+    """
+    Weighted histogram of the particles' theta on a fixed grid over theta_range, normalized to a density.
+    Its size does not depend on the number of particles, so neither does the cost of drawing it.
+    A step whose particles all fall outside theta_range, e.g. when the filter drifts, gives zeros.
+    """
+    counts, _ = np.histogram(theta + theta_offset, bins=bins, range=theta_range, weights=weights)
+    in_range = np.sum(counts)
+    if in_range > 0:
+        counts /= in_range * (theta_range[1] - theta_range[0]) / bins
+    return counts
+
+
+def theta_quantiles(theta, weights, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    """Weighted quantiles of the particles' theta, e.g. to draw the belief as bands around the median."""
+    order = np.argsort(theta)
+    cumulative_sum = np.cumsum(weights[order])
+    positions = np.searchsorted(cumulative_sum, np.asarray(quantiles) * cumulative_sum[-1])
+    return theta[order][np.minimum(positions, len(theta) - 1)] + theta_offset
+
+
+def run_histograms(bins=200):
+    """(bins, T) image of the theta histograms of every time step of the recorded run."""
+    trajectory = particle_store.ParticleTrajectory(directory)
+    image = np.empty((bins, len(trajectory)))
+    for t in range(len(trajectory)):
+        image[:, t] = theta_histogram(trajectory.particles(t)[:, 1], trajectory.weights(t), bins)
+    return image
+
+
+def density_animator(data, image, scat, density):
+    """
+    Animator for the density mode: bins the particle set of time step t into column t of
+    'density' and shows the columns filled so far as one image, instead of N scatter points.
+    """
+    t, theta, dtheta, theta_true, dtheta_true, weights = data
+    density[:, t] = theta_histogram(theta, weights, density.shape[0])
+    image.set_data(density)
+    image.autoscale()
+    scat.set_offsets(np.c_[t, theta_true])
+
+
+def plot_run_density(bins=200):
+    """Shows a whole recorded run as one heatmap of the theta histograms, with the true theta on top."""
+    image = run_histograms(bins)
+    theta_true, dtheta_true = sm.retreive_data(1)
+    fig, ax = plt.subplots()
+    ax.set_title(r"Particle Filter belief of tilt angle $\theta$")
+    ax.set(xlabel="Number of observations", ylabel=r"Tilt Angle $\theta$ ($rad$)")
+    ax.imshow(image, origin="lower", aspect="auto", cmap="Blues",
+              extent=(0, image.shape[1], theta_range[0], theta_range[1]))
+    ax.plot(theta_true[:image.shape[1]], color="red", lw=1)
+    plt.show()
+
+
+def main(mode="scatter", bins=200):
+    """
+    Parameters:
+    mode: "scatter" draws every particle of the current time step. "density" draws the theta
+          histogram of every time step as a column of a heatmap, at a cost independent of N
+    bins: number of histogram bins in the density mode
+    """
     fig, ax = plt.subplots()
     ax.set_title(r"Particle Filter estimate of tilt angle $\theta$")
     ax.set(xlabel="Number of observations", ylabel="Tilt Angle $\theta$ ($rad$)")
     ax.grid()
-    ax.set(xlim=(-1, 1001), ylim=(-3, 3))
+    ax.set(xlim=(-1, 1001), ylim=theta_range)
+
+    if mode == "density":
+        n_steps = len(particle_store.ParticleTrajectory(directory))
+        density = np.zeros((bins, n_steps))
+        image = ax.imshow(density, origin="lower", aspect="auto", cmap="Blues",
+                          extent=(0, n_steps, theta_range[0], theta_range[1]))
+        scat = ax.scatter([], [], s=20, color="red")
+        ani = FuncAnimation(fig=fig,
+                            func=density_animator,
+                            frames=generator,
+                            fargs=(image, scat, density),
+                            interval=20)
+        plt.show()
+        return
+
     scat1 = ax.scatter([], [], s=3, color="blue")
     scat2 = ax.scatter([], [], s=20, color="red")
     ani = FuncAnimation(fig=fig,
@@ -48,7 +127,7 @@ def main():
 
 if __name__ == "__main__":
     main()
-    # particle_set = np.loadtxt("./particle_dataset/particle_set_400")
+    # particle_set = particle_store.ParticleTrajectory(directory).particles(400)
     # theta_est = particle_set[:, 1]
     # dtheta_est = particle_set[:, 0]
     # theta_true, dtheta_true = sm.retreive_data(1)               # validation data; unit rad, rad/sec